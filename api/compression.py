@@ -0,0 +1,64 @@
+"""Сжатие ответов API.
+
+Клиент получает brotli, если он его принимает и установлен пакет
+brotli (необязательная зависимость), иначе gzip. Короткие ответы
+не сжимаются: заголовки gzip съели бы выигрыш. Сжатое тело уже
+не совпадает побайтно с несжатым, поэтому ETag становится слабым,
+как у django.middleware.gzip.
+"""
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+MIN_LENGTH = 200
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compress(request, response):
+    if (
+        response.streaming
+        or response.has_header('Content-Encoding')
+        or len(response.content) < MIN_LENGTH
+    ):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in accepted:
+        encoding = 'br'
+        content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+    elif 'gzip' in accepted:
+        encoding = 'gzip'
+        content = compress_string(response.content)
+    else:
+        return response
+    if len(content) >= len(response.content):
+        return response
+    response.content = content
+    response['Content-Length'] = str(len(content))
+    response['Content-Encoding'] = encoding
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
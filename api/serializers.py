@@ -0,0 +1,103 @@
+"""Поля ресурсов API.
+
+У каждого ресурса — таблица {поле: функция объекта} и связи, которые
+нужны полю. ?fields=id,text оставляет в ответе только перечисленные
+поля, а выборка подтягивает select_related только для них: список
+любой длины читается фиксированным числом запросов.
+"""
+from operator import attrgetter
+
+
+class FieldError(ValueError):
+    pass
+
+
+class Resource:
+    fields = {}
+    select = {}
+
+    def __init__(self, names=None):
+        names = list(self.fields) if names is None else names
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise FieldError('Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown) or '—',
+                ', '.join(self.fields)
+            ))
+        self.names = names
+
+    @classmethod
+    def from_request(cls, request):
+        raw = request.GET.get('fields')
+        if raw is None:
+            return cls()
+        return cls(list(dict.fromkeys(
+            name.strip() for name in raw.split(',') if name.strip()
+        )))
+
+    def prepare(self, queryset):
+        related = sorted({
+            relation
+            for name in self.names
+            for relation in self.select.get(name, ())
+        })
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset
+
+    def dump(self, obj):
+        return {name: self.fields[name](obj) for name in self.names}
+
+    def dump_all(self, objects):
+        return [self.dump(obj) for obj in objects]
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id else None
+
+
+class PostResource(Resource):
+    fields = {
+        'id': attrgetter('pk'),
+        'author': attrgetter('author.username'),
+        'group': _group_slug,
+        'text': attrgetter('text'),
+        'pub_date': attrgetter('pub_date'),
+        'image': _image_url,
+        'comment_count': attrgetter('comment_count'),
+    }
+    select = {'author': ('author',), 'group': ('group',)}
+
+
+class CommentResource(Resource):
+    fields = {
+        'id': attrgetter('pk'),
+        'post': attrgetter('post_id'),
+        'author': attrgetter('author.username'),
+        'text': attrgetter('text'),
+        'created': attrgetter('created'),
+        'parent': attrgetter('parent_id'),
+        'depth': attrgetter('depth'),
+    }
+    select = {'author': ('author',)}
+
+
+class GroupResource(Resource):
+    fields = {
+        'id': attrgetter('pk'),
+        'slug': attrgetter('slug'),
+        'title': attrgetter('title'),
+        'description': attrgetter('description'),
+    }
+
+
+class FollowResource(Resource):
+    fields = {
+        'id': attrgetter('pk'),
+        'author': attrgetter('author.username'),
+    }
+    select = {'author': ('author',)}
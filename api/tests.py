@@ -0,0 +1,237 @@
+import gzip
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import COMMENTS_PER_PAGE
+
+from . import compression
+
+
+class ApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа API',
+            slug='api-group',
+            description='Описание группы'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Запись API №{number}',
+                author=cls.author,
+                group=cls.group if number % 2 else None
+            )
+            for number in range(15)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, url, params=None, client=None, status=200):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response.status_code, status)
+        return json.loads(response.content)
+
+
+class PostsApiTests(ApiTestCase):
+    def test_posts_page_and_cursor_links(self):
+        """Список записей листается курсором вперёд и назад"""
+        first = self.get_json(reverse('api:posts'), {'limit': 10})
+        self.assertEqual(
+            [post['id'] for post in first['results']],
+            [post.pk for post in reversed(self.posts[5:])]
+        )
+        self.assertIsNone(first['previous'])
+        second = self.get_json(first['next'])
+        self.assertEqual(
+            [post['id'] for post in second['results']],
+            [post.pk for post in reversed(self.posts[:5])]
+        )
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.get_json(second['previous']), first)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Автор и группа приходят в том же запросе, что и записи"""
+        for limit in (1, 15):
+            with self.subTest(limit=limit), self.assertNumQueries(1):
+                self.client.get(reverse('api:posts'), {'limit': limit})
+
+    def test_sparse_fields(self):
+        """?fields оставляет только перечисленные поля и не подтягивает
+        связи, которые им не нужны"""
+        with self.assertNumQueries(1) as queries:
+            data = self.get_json(
+                reverse('api:posts'),
+                {'fields': 'id,text', 'limit': 1}
+            )
+        self.assertEqual(
+            data['results'],
+            [{'id': self.posts[-1].pk, 'text': self.posts[-1].text}]
+        )
+        self.assertNotIn('auth_user', queries.captured_queries[0]['sql'])
+        self.get_json(
+            reverse('api:posts'),
+            {'fields': 'id,password'},
+            status=400
+        )
+
+    def test_filters(self):
+        """Записи группы и автора"""
+        data = self.get_json(
+            reverse('api:posts'),
+            {'group': self.group.slug, 'fields': 'group', 'limit': 100}
+        )
+        self.assertEqual(len(data['results']), 7)
+        self.assertEqual({post['group'] for post in data['results']}, {
+            self.group.slug
+        })
+        data = self.get_json(
+            reverse('api:posts'),
+            {'author': self.reader.username}
+        )
+        self.assertEqual(data['results'], [])
+        self.get_json(reverse('api:posts'), {'group': 'missing'}, status=404)
+
+    def test_batch_lookup_by_ids(self):
+        """?ids возвращает записи в порядке запроса одним запросом"""
+        ids = [self.posts[3].pk, self.posts[0].pk, 10 ** 6, self.posts[7].pk]
+        with self.assertNumQueries(1):
+            data = self.get_json(
+                reverse('api:posts'),
+                {'ids': ','.join(map(str, ids)), 'fields': 'id,author'}
+            )
+        self.assertEqual(data['results'], [
+            {'id': pk, 'author': self.author.username}
+            for pk in (ids[0], ids[1], ids[3])
+        ])
+        self.get_json(reverse('api:posts'), {'ids': '1,x'}, status=400)
+
+    def test_post_detail(self):
+        post = self.posts[1]
+        data = self.get_json(reverse('api:post', args=[post.pk]))
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['author'], self.author.username)
+        self.get_json(reverse('api:post', args=[10 ** 6]), status=404)
+
+    def test_etag_changes_with_posts(self):
+        """Повторный запрос с ETag получает 304 без выборки записей,
+        новая запись меняет ETag"""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comments_in_chunks(self):
+        post = self.posts[0]
+        for number in range(COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                text=f'Комментарий №{number}',
+                author=self.reader,
+                post=post
+            )
+        url = reverse('api:post_comments', args=[post.pk])
+        first = self.get_json(url)
+        self.assertEqual(len(first['results']), COMMENTS_PER_PAGE)
+        self.assertEqual(first['results'][0]['author'], self.reader.username)
+        second = self.get_json(first['next'])
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+
+
+class FeedAndFollowsApiTests(ApiTestCase):
+    def test_login_required(self):
+        for url in (reverse('api:feed'), reverse('api:follows')):
+            with self.subTest(url=url):
+                self.get_json(url, status=401)
+
+    def test_follow_feed_and_unfollow(self):
+        """Подписка через API, лента подписок и отписка"""
+        response = self.reader_client.post(
+            reverse('api:follows'),
+            json.dumps({'author': self.author.username}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+        )
+        follows = self.get_json(
+            reverse('api:follows'),
+            client=self.reader_client
+        )
+        self.assertEqual(
+            [follow['author'] for follow in follows['results']],
+            [self.author.username]
+        )
+        feed = self.get_json(
+            reverse('api:feed'),
+            {'limit': 100},
+            client=self.reader_client
+        )
+        self.assertEqual(len(feed['results']), len(self.posts))
+        response = self.reader_client.delete(
+            reverse('api:unfollow', args=[self.author.username])
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.reader))
+
+    def test_cannot_follow_self(self):
+        response = self.reader_client.post(
+            reverse('api:follows'),
+            {'author': self.reader.username}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_method_not_allowed(self):
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET')
+
+
+class CompressionTests(ApiTestCase):
+    def test_gzip(self):
+        """Ответ сжимается gzip, ETag становится слабым"""
+        response = self.client.get(
+            reverse('api:posts'),
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), 10)
+
+    def test_brotli_preferred_when_installed(self):
+        brotli = mock.Mock()
+        brotli.compress.return_value = b'br'
+        with mock.patch.object(compression, 'brotli', brotli):
+            response = self.client.get(
+                reverse('api:posts'),
+                HTTP_ACCEPT_ENCODING='gzip, br'
+            )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, b'br')
+
+    def test_no_compression_without_accept_encoding(self):
+        for header in ('', 'gzip;q=0'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    reverse('api:posts'),
+                    HTTP_ACCEPT_ENCODING=header
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,24 @@
+from django.urls import path
+
+from api import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/posts/', views.posts, name='posts'),
+    path('v1/posts/<int:post_id>/', views.post_detail, name='post'),
+    path(
+        'v1/posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('v1/feed/', views.feed, name='feed'),
+    path('v1/groups/', views.groups, name='groups'),
+    path('v1/groups/<slug:slug>/', views.group_detail, name='group'),
+    path('v1/follows/', views.follows, name='follows'),
+    path(
+        'v1/follows/<str:username>/',
+        views.unfollow,
+        name='unfollow'
+    ),
+]
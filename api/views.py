@@ -0,0 +1,363 @@
+"""JSON API v1 для мобильного клиента.
+
+Ответы строятся на тех же моделях и выборках, что и страницы, но без
+шаблонов. Все ответы:
+
+* сжимаются brotli или gzip (api.compression);
+* получают ETag (и Last-Modified, если ответ у всех один) из версий
+  областей кеша, как страницы (posts.conditional), и на совпадение
+  отвечают 304 без запросов к записям; ответ без областей получает
+  ETag по содержимому;
+* принимают ?fields=... (api.serializers).
+
+Списки листаются курсором: next и previous — готовые ссылки на соседние
+страницы, ?limit= задаёт размер страницы. ?ids=1,2,3 у записей
+и групп возвращает объекты с этими id в порядке запроса одним
+запросом, без пагинации.
+
+Лента и подписки требуют входа (сессия) и отвечают 401 без него;
+POST и DELETE, как и формы сайта, проверяют CSRF-токен.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from posts import cache_versions
+from posts.conditional import PageValidators
+from posts.feed import feed_page
+from posts.models import Follow, Group, Post, User
+from posts.paginators import POSTS_PER_PAGE, CursorPaginator
+from posts.views import comment_page, find_comment
+from yatube.replicas import replica_reads
+
+from .compression import compress
+from .serializers import (
+    CommentResource, FieldError, FollowResource, GroupResource, PostResource
+)
+
+MAX_LIMIT = 100
+MAX_IDS = 100
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def _content_etag(request, response):
+    """ETag по содержимому и 304 на совпадение."""
+    response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+    return get_conditional_response(
+        request,
+        etag=response['ETag'],
+        response=response
+    )
+
+
+def _call(view, request, args, kwargs, methods, login):
+    """Ответ view или ошибка в JSON."""
+    try:
+        allowed = (*methods, 'HEAD') if 'GET' in methods else methods
+        if request.method not in allowed:
+            response = api_response({'error': 'Метод не поддерживается'}, 405)
+            response['Allow'] = ', '.join(methods)
+            return response
+        if login and not request.user.is_authenticated:
+            raise ApiError('Требуется вход', 401)
+        return view(request, *args, **kwargs)
+    except FieldError as error:
+        return api_response({'error': str(error)}, 400)
+    except ApiError as error:
+        return api_response({'error': str(error)}, error.status)
+    except Http404:
+        return api_response({'error': 'Не найдено'}, 404)
+
+
+def api_view(methods=('GET',), login=False):
+    """Ответы об ошибках в JSON, ETag и сжатие для view API."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = _call(view, request, args, kwargs, methods, login)
+            if (
+                request.method == 'GET'
+                and response.status_code == 200
+                and not response.has_header('ETag')
+            ):
+                response = _content_etag(request, response)
+            return compress(request, response)
+        return wrapper
+    return decorator
+
+
+def _limit(request):
+    raw = request.GET.get('limit')
+    if raw is None:
+        return POSTS_PER_PAGE
+    if not raw.isdigit() or not 1 <= int(raw) <= MAX_LIMIT:
+        raise ApiError(f'limit — число от 1 до {MAX_LIMIT}')
+    return int(raw)
+
+
+def _ids(request):
+    """id из ?ids=1,2,3 без повторов или None, если параметра нет."""
+    raw = request.GET.get('ids')
+    if raw is None:
+        return None
+    ids = list(dict.fromkeys(part.strip() for part in raw.split(',')))
+    if not all(part.isdigit() for part in ids) or len(ids) > MAX_IDS:
+        raise ApiError(f'ids — до {MAX_IDS} чисел через запятую')
+    return [int(part) for part in ids]
+
+
+def _page_url(request, number, cursor_name, cursor):
+    params = request.GET.copy()
+    for name in ('page', 'after', 'before'):
+        params.pop(name, None)
+    params['page'] = number
+    params[cursor_name] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def paginated(request, queryset, resource, **options):
+    """Страница queryset по курсору из запроса со ссылками на соседние
+    (в ссылках, как и на сайте, есть номер страницы: по нему
+    CursorPaginator понимает, что предыдущая страница существует)."""
+    page = CursorPaginator(
+        resource.prepare(queryset),
+        per_page=_limit(request),
+        **options
+    ).get_page(request.GET)
+    return page_data(request, page, resource)
+
+
+def page_data(request, page, resource):
+    data = {
+        'results': resource.dump_all(page.object_list),
+        'next': None,
+        'previous': None,
+    }
+    if page.next_cursor:
+        data['next'] = _page_url(
+            request, page.number + 1, 'after', page.next_cursor
+        )
+    if page.previous_cursor:
+        data['previous'] = _page_url(
+            request, page.number - 1, 'before', page.previous_cursor
+        )
+    return data
+
+
+def by_ids(queryset, resource, ids):
+    found = resource.prepare(queryset).in_bulk(ids)
+    return {
+        'results': [resource.dump(found[pk]) for pk in ids if pk in found],
+    }
+
+
+def conditional(request, scopes, build):
+    """Ответ с валидаторами областей scopes; build() вызывается, только
+    если у клиента нет актуальной версии."""
+    validators = PageValidators(request, *scopes)
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    return validators.apply(api_response(build()))
+
+
+@replica_reads
+@api_view()
+def posts(request):
+    """Записи: все, группы (?group=slug) или автора (?author=username)."""
+    resource = PostResource.from_request(request)
+    ids = _ids(request)
+    if ids is not None:
+        return conditional(
+            request,
+            [cache_versions.post_scope(pk) for pk in ids],
+            lambda: by_ids(Post.objects.all(), resource, ids)
+        )
+    post_list = Post.objects.all()
+    scopes = []
+    if 'group' in request.GET:
+        group = get_object_or_404(Group, slug=request.GET['group'])
+        post_list = post_list.filter(group=group)
+        scopes.append(cache_versions.group_scope(group.pk))
+    if 'author' in request.GET:
+        author = get_object_or_404(User, username=request.GET['author'])
+        post_list = post_list.filter(author=author)
+        scopes.append(cache_versions.profile_scope(author.pk))
+    return conditional(
+        request,
+        scopes or [cache_versions.index_scope()],
+        lambda: paginated(request, post_list, resource)
+    )
+
+
+@replica_reads
+@api_view()
+def post_detail(request, post_id):
+    resource = PostResource.from_request(request)
+    post = get_object_or_404(resource.prepare(Post.objects), pk=post_id)
+    return conditional(
+        request,
+        [
+            cache_versions.post_scope(post.pk),
+            cache_versions.profile_scope(post.author_id),
+        ],
+        lambda: resource.dump(post)
+    )
+
+
+@replica_reads
+@api_view()
+def post_comments(request, post_id):
+    """Комментарии в порядке веток (или ветка ?thread=id) порциями,
+    как кнопка «Показать ещё» на странице записи."""
+    resource = CommentResource.from_request(request)
+    post = get_object_or_404(Post, pk=post_id)
+
+    def build():
+        thread = find_comment(post, request.GET.get('thread'))
+        page = comment_page(post, {'after': request.GET.get('after')}, thread)
+        next_url = None
+        if page.has_next():
+            next_url = _page_url(
+                request, page.number + 1, 'after', page.next_cursor
+            )
+        return {
+            'results': resource.dump_all(page.object_list),
+            'next': next_url,
+        }
+
+    return conditional(
+        request,
+        [
+            cache_versions.post_scope(post.pk),
+            cache_versions.profile_scope(post.author_id),
+        ],
+        build
+    )
+
+
+@replica_reads
+@api_view(login=True)
+def feed(request):
+    """Лента подписок текущего пользователя."""
+    resource = PostResource.from_request(request)
+    return conditional(
+        request,
+        [
+            cache_versions.index_scope(),
+            cache_versions.profile_scope(request.user.pk),
+        ],
+        lambda: page_data(
+            request,
+            feed_page(
+                request.user,
+                request.GET,
+                resource.prepare(Post.objects.all()),
+                _limit(request)
+            ),
+            resource
+        )
+    )
+
+
+@replica_reads
+@api_view()
+def groups(request):
+    resource = GroupResource.from_request(request)
+    ids = _ids(request)
+    if ids is not None:
+        return api_response(by_ids(Group.objects.all(), resource, ids))
+    return api_response(paginated(
+        request,
+        Group.objects.all(),
+        resource,
+        keys=('id',),
+        descending=False
+    ))
+
+
+@replica_reads
+@api_view()
+def group_detail(request, slug):
+    resource = GroupResource.from_request(request)
+    group = get_object_or_404(Group, slug=slug)
+    return conditional(
+        request,
+        [cache_versions.group_scope(group.pk)],
+        lambda: resource.dump(group)
+    )
+
+
+def _request_data(request):
+    if request.content_type != 'application/json':
+        return request.POST
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ApiError('Тело запроса — JSON-объект')
+    return data
+
+
+@replica_reads
+@api_view(methods=('GET', 'POST'), login=True)
+def follows(request):
+    """Авторы, на которых подписан пользователь; POST {"author":
+    username} подписывает на автора."""
+    resource = FollowResource.from_request(request)
+    if request.method == 'POST':
+        return follow(request, resource)
+    return conditional(
+        request,
+        [cache_versions.profile_scope(request.user.pk)],
+        lambda: paginated(
+            request,
+            Follow.objects.filter(user=request.user),
+            resource,
+            keys=('id',)
+        )
+    )
+
+
+@transaction.atomic
+def follow(request, resource):
+    username = _request_data(request).get('author')
+    if not isinstance(username, str):
+        raise ApiError('Не указан author')
+    author = get_object_or_404(User, username=username)
+    if author == request.user:
+        raise ApiError('Нельзя подписаться на себя')
+    subscription, created = Follow.objects.get_or_create(
+        user=request.user,
+        author=author
+    )
+    return api_response(resource.dump(subscription), 201 if created else 200)
+
+
+@api_view(methods=('DELETE',), login=True)
+@transaction.atomic
+def unfollow(request, username):
+    subscription = get_object_or_404(
+        Follow,
+        user=request.user,
+        author__username=username
+    )
+    subscription.delete()
+    return HttpResponse(status=204)
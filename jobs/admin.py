@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import Job
+from .queue import requeue_dead
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'run_at', 'created'
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
+    actions = ('requeue',)
+
+    def requeue(self, request, queryset):
+        requeue_dead(queryset)
+    requeue.short_description = 'Вернуть в очередь'
+
+
+admin.site.register(Job, JobAdmin)
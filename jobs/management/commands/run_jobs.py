@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import claim_next, requeue_dead, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Вернуть в очередь все задачи со статусом dead и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = requeue_dead()
+            self.stdout.write(f'Возвращено в очередь: {count}.')
+            return
+        done = failed = 0
+        while True:
+            requeue_stale()
+            job = claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if run_job(job):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(f'Выполнено: {done}, с ошибкой: {failed}.')
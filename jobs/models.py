@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DEAD, 'Не выполнена'),
+    )
+
+    name = models.CharField('задача', max_length=200)
+    payload = models.TextField('аргументы', default='{}')
+    status = models.CharField(
+        'состояние',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField('попыток', default=0)
+    max_attempts = models.PositiveIntegerField('максимум попыток', default=5)
+    run_at = models.DateTimeField('запустить после', default=timezone.now)
+    locked_at = models.DateTimeField('взята в работу', null=True, blank=True)
+    last_error = models.TextField('последняя ошибка', blank=True)
+    created = models.DateTimeField('создана', auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='job_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,108 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача — функция, зарегистрированная декоратором @task в модуле
+tasks.py любого приложения. enqueue() кладёт строку Job в той же
+транзакции, что и данные, к которым она относится; воркер
+(manage.py run_jobs) забирает задачи условным UPDATE, поэтому
+воркеров может быть несколько. Упавшая задача повторяется с
+экспоненциальной задержкой, после max_attempts попыток она остаётся
+в таблице со статусом dead.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name):
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(name, *args, max_attempts=None, delay=0, **kwargs):
+    if name not in registry:
+        raise KeyError(f'Задача {name} не зарегистрирована')
+    job = Job.objects.create(
+        name=name,
+        payload=json.dumps({'args': args, 'kwargs': kwargs}),
+        max_attempts=max_attempts or _setting('JOBS_MAX_ATTEMPTS', 5),
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if _setting('JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_job(job))
+    return job
+
+
+def requeue_stale(now=None):
+    """Возвращает в очередь задачи воркеров, которые не завершились."""
+    now = now or timezone.now()
+    timeout = timedelta(seconds=_setting('JOBS_LOCK_TIMEOUT', 600))
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timeout
+    ).update(status=Job.QUEUED, locked_at=None)
+
+
+def claim_next(now=None):
+    now = now or timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED,
+        run_at__lte=now
+    ).values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    payload = json.loads(job.payload)
+    job.attempts += 1
+    try:
+        registry[job.name](*payload['args'], **payload['kwargs'])
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.DEAD
+            logger.error('Задача %s не выполнена:\n%s', job, job.last_error)
+        else:
+            job.status = Job.QUEUED
+            backoff = _setting('JOBS_RETRY_BACKOFF', 30)
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff * 2 ** (job.attempts - 1)
+            )
+        job.locked_at = None
+        job.save()
+        return False
+    job.delete()
+    return True
+
+
+def requeue_dead(queryset=None):
+    if queryset is None:
+        queryset = Job.objects.all()
+    return queryset.filter(status=Job.DEAD).update(
+        status=Job.QUEUED,
+        attempts=0,
+        run_at=timezone.now()
+    )
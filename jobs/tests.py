@@ -0,0 +1,72 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_next, enqueue, requeue_dead, requeue_stale, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.fail')
+def fail():
+    raise RuntimeError('Ошибка задачи')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_queued_job(self):
+        """Воркер выполняет задачу и удаляет её из очереди"""
+        enqueue('jobs.tests.record', 'значение')
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(calls, ['значение'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        """Отложенная задача не берётся в работу раньше времени"""
+        enqueue('jobs.tests.record', 1, delay=60)
+        self.assertIsNone(claim_next())
+
+    def test_failed_job_retried_then_dead(self):
+        """Упавшая задача повторяется, а затем попадает в dead"""
+        job = enqueue('jobs.tests.fail', max_attempts=2)
+        call_command('run_jobs', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        call_command('run_jobs', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertIn('Ошибка задачи', job.last_error)
+
+        self.assertEqual(requeue_dead(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+    def test_stale_running_job_requeued(self):
+        """Задача упавшего воркера возвращается в очередь"""
+        job = enqueue('jobs.tests.record', 1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim_next().pk, job.pk)
+
+    def test_unknown_task_rejected(self):
+        """Нельзя поставить в очередь незарегистрированную задачу"""
+        with self.assertRaises(KeyError):
+            enqueue('jobs.tests.unknown')
@@ -0,0 +1,237 @@
+"""Нагрузочный бенчмарк: смесь запросов к WSGI-приложению.
+
+Сценарий — последовательность запросов index, group, profile,
+post_view, follow_index, new_post и add_comment в пропорциях MIX,
+выбранных детерминированно от seed. Запросы идут через
+yatube.wsgi.application со всеми middleware, как от настоящего
+сервера; авторизация — cookie сессии, POST — с CSRF-токеном.
+Для каждого запроса замеряются время и число SQL-запросов, итог
+сравнивается с сохранённым эталоном (compare()).
+"""
+import random
+import time
+from collections import defaultdict
+from importlib import import_module
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY,
+)
+from django.db import connection
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from yatube.metrics import percentiles
+from yatube.wsgi import application
+
+from .models import Group, Post, User
+
+MIX = {
+    'index': 35,
+    'group': 12,
+    'profile': 15,
+    'post_view': 20,
+    'follow_index': 10,
+    'new_post': 3,
+    'add_comment': 5,
+}
+SESSION_USERS = 50
+EXPECTED_STATUS = {'GET': 200, 'POST': 302}
+
+
+class Session:
+    """Cookie авторизованного пользователя и CSRF-токен для POST."""
+
+    def __init__(self, user):
+        engine = import_module(settings.SESSION_ENGINE)
+        store = engine.SessionStore()
+        store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.save()
+        self.user = user
+        self.csrf_token = get_random_string(32)
+        self.cookie = (
+            f'{settings.SESSION_COOKIE_NAME}={store.session_key}; '
+            f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}'
+        )
+
+
+def call_wsgi(method, url, session=None, data=None):
+    """(статус, число байт ответа) для одного запроса."""
+    parts = urlsplit(url)
+    body = b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': 'localhost',
+        'HTTP_HOST': 'localhost',
+    }
+    if session is not None:
+        environ['HTTP_COOKIE'] = session.cookie
+    if method == 'POST':
+        body = urlencode(
+            {**data, 'csrfmiddlewaretoken': session.csrf_token}
+        ).encode()
+        environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input'] = BytesIO(body)
+    setup_testing_defaults(environ)
+    status = []
+    response = application(
+        environ,
+        lambda code, headers, exc_info=None: status.append(code)
+    )
+    try:
+        size = sum(len(chunk) for chunk in response)
+    finally:
+        response.close()
+    return int(status[0].split()[0]), size
+
+
+class Scenario:
+    """Детерминированная последовательность запросов от seed."""
+
+    def __init__(self, seed=0, mix=None):
+        self.rng = random.Random(f'{seed}:benchmark')
+        self.mix = mix or MIX
+        users = list(User.objects.filter(
+            is_active=True
+        ).order_by('pk')[:SESSION_USERS])
+        self.sessions = [Session(user) for user in users]
+        self.authors = list(
+            Post.objects.order_by().values_list(
+                'author__username', flat=True
+            ).distinct()[:1000]
+        )
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.posts = list(
+            Post.objects.values_list('author__username', 'pk')[:1000]
+        )
+
+    def next_request(self):
+        kinds = [kind for kind in self.mix if self._possible(kind)]
+        kind = self.rng.choices(
+            kinds,
+            weights=[self.mix[kind] for kind in kinds]
+        )[0]
+        return (kind, *getattr(self, f'_{kind}')())
+
+    def _possible(self, kind):
+        needs = {
+            'group': self.groups,
+            'profile': self.authors,
+            'post_view': self.posts,
+            'add_comment': self.posts and self.sessions,
+            'follow_index': self.sessions,
+            'new_post': self.sessions,
+        }
+        return bool(needs.get(kind, True))
+
+    def _session(self):
+        return self.rng.choice(self.sessions)
+
+    def _index(self):
+        page = self.rng.choice((1, 1, 1, 2, 3))
+        return 'GET', f"{reverse('index')}?page={page}", None, None
+
+    def _group(self):
+        slug = self.rng.choice(self.groups)
+        return 'GET', reverse('group', args=[slug]), None, None
+
+    def _profile(self):
+        username = self.rng.choice(self.authors)
+        return 'GET', reverse('profile', args=[username]), None, None
+
+    def _post_view(self):
+        url = reverse('post', args=self.rng.choice(self.posts))
+        return 'GET', url, None, None
+
+    def _follow_index(self):
+        return 'GET', reverse('follow_index'), self._session(), None
+
+    def _new_post(self):
+        data = {'text': f'Запись бенчмарка {self.rng.random()}'}
+        return 'POST', reverse('new_post'), self._session(), data
+
+    def _add_comment(self):
+        url = reverse('add_comment', args=self.rng.choice(self.posts))
+        data = {'text': 'Комментарий бенчмарка'}
+        return 'POST', url, self._session(), data
+
+
+def run(requests=1000, warmup=100, seed=0, mix=None):
+    """Отчёт: rps, перцентили времени (мс) и SQL-запросы на запрос."""
+    scenario = Scenario(seed, mix)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(1)
+        return execute(sql, params, many, context)
+
+    for number in range(warmup + requests):
+        kind, method, url, session, data = scenario.next_request()
+        queries.clear()
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            status, _ = call_wsgi(method, url, session, data)
+        elapsed = time.perf_counter() - start
+        if number < warmup:
+            continue
+        if status != EXPECTED_STATUS[method]:
+            errors[kind] += 1
+        samples[kind].append((elapsed, len(queries)))
+    return report(samples, errors)
+
+
+def _summary(samples):
+    latencies = [elapsed * 1000 for elapsed, _ in samples]
+    return {
+        'count': len(samples),
+        'latency_ms': percentiles(latencies),
+        'queries': round(
+            sum(count for _, count in samples) / len(samples), 2
+        ),
+    }
+
+
+def report(samples, errors):
+    everything = [sample for kind in samples for sample in samples[kind]]
+    elapsed = sum(duration for duration, _ in everything)
+    return {
+        'requests': len(everything),
+        'rps': round(len(everything) / elapsed, 1) if elapsed else 0,
+        'errors': dict(errors),
+        'overall': _summary(everything),
+        'views': {kind: _summary(samples[kind]) for kind in sorted(samples)},
+    }
+
+
+def compare(result, baseline, tolerance=0.2):
+    """Список регрессий относительно baseline: rps ниже, p95 выше
+    более чем на tolerance, или SQL-запросов на запрос стало больше."""
+    regressions = []
+    if result['rps'] < baseline['rps'] * (1 - tolerance):
+        regressions.append(
+            f"rps: {baseline['rps']} -> {result['rps']}"
+        )
+    for kind, base in baseline['views'].items():
+        current = result['views'].get(kind)
+        if current is None:
+            continue
+        base_p95 = base['latency_ms']['p95']
+        p95 = current['latency_ms']['p95']
+        if p95 > base_p95 * (1 + tolerance):
+            regressions.append(f'{kind} p95: {base_p95} -> {p95} мс')
+        if current['queries'] > base['queries'] + 0.5:
+            regressions.append(
+                f"{kind} запросов: {base['queries']} -> "
+                f"{current['queries']}"
+            )
+    return regressions
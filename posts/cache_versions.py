@@ -0,0 +1,130 @@
+"""Версии кеша страниц.
+
+Ключ фрагмента включает версию области (index, group, profile, post),
+а сигналы увеличивают версию при изменении Post, Comment или Follow.
+Поэтому фрагменты можно хранить часами: после записи новый ключ
+просто не совпадёт со старым. Пропавшая из кеша версия
+восстанавливается текущим временем в миллисекундах, чтобы не
+совпасть ни с одной из выданных раньше.
+
+Рядом с версией хранится время последнего изменения области (секунды
+Unix): из пары собираются ETag и Last-Modified страниц (posts.conditional).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from jobs.queue import enqueue
+from yatube.replicas import replica_aliases, replica_lag
+
+VERSION_KEY = 'version:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def _initial_modified():
+    return int(time.time())
+
+
+def _get_or_add(initials):
+    """{ключ: значение} для всех ключей initials; пропавшие ключи
+    получают начальное значение, если их не успел записать другой
+    процесс."""
+    values = cache.get_many(list(initials))
+    for key, initial in initials.items():
+        if key not in values:
+            cache.add(key, initial(), None)
+            values[key] = cache.get(key)
+    return values
+
+
+def get_version(*scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = _get_or_add(dict.fromkeys(keys, _initial_version))
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def get_versions(scopes):
+    """{область: версия} для многих областей за одно обращение к кешу."""
+    keys = {scope: VERSION_KEY.format(scope) for scope in scopes}
+    versions = _get_or_add(dict.fromkeys(keys.values(), _initial_version))
+    return {scope: str(versions[key]) for scope, key in keys.items()}
+
+
+def get_validators(*scopes):
+    """(версия как у get_version(), время последнего изменения
+    областей в секундах) за одно обращение к кешу."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    modified_keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    values = _get_or_add({
+        **dict.fromkeys(keys, _initial_version),
+        **dict.fromkeys(modified_keys, _initial_modified),
+    })
+    return (
+        '.'.join(str(values[key]) for key in keys),
+        max(values[key] for key in modified_keys),
+    )
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): _initial_modified() for scope in scopes},
+        None
+    )
+
+
+def invalidate(*scopes):
+    """Увеличивает версии сразу и ещё раз после коммита.
+
+    Фрагмент, собранный между двумя увеличениями по ещё старым данным,
+    останется под промежуточной версией и больше не будет прочитан.
+    С репликами (yatube.replicas) старые данные можно прочитать и после
+    коммита, пока реплика не догнала основную базу, поэтому версии
+    увеличиваются в третий раз фоновой задачей через
+    DATABASE_REPLICA_LAG секунд.
+    """
+    bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+    if replica_aliases():
+        enqueue(
+            'posts.bump_cache_versions',
+            *scopes,
+            delay=replica_lag()
+        )
+
+
+def post_scopes(post_id, author_id, group_id=None):
+    scopes = [
+        index_scope(),
+        profile_scope(author_id),
+        post_scope(post_id),
+    ]
+    if group_id:
+        scopes.append(group_scope(group_id))
+    return scopes
@@ -0,0 +1,63 @@
+"""Условные GET-запросы страниц записей.
+
+Валидаторы страницы берутся из версий областей кеша (cache_versions):
+сигналы увеличивают их при любом изменении записей, комментариев,
+подписок, групп и имён авторов, поэтому ETag меняется вместе
+с содержимым, а посчитать его можно без запросов к базе. В ETag входят
+также пользователь и CSRF-cookie: страница у каждого своя, а формы
+в ней содержат токен. Last-Modified — время последнего изменения тех
+же областей — не различает пользователей, поэтому он отдаётся
+и If-Modified-Since проверяется только для общей страницы анонима без
+CSRF-cookie; иначе после входа или выхода клиент получил бы 304 на
+страницу, нарисованную для прежней сессии.
+
+View проверяет валидаторы сразу после того, как нашёл основной объект
+страницы, и на совпадение отвечает 304 — без выборки записей
+и отрисовки шаблона.
+"""
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import cache_versions
+
+
+class PageValidators:
+    def __init__(self, request, *scopes):
+        self.version, self.last_modified = cache_versions.get_validators(
+            *scopes
+        )
+        raw = '{}:{}:{}'.format(
+            self.version,
+            request.user.pk or '',
+            request.META.get('CSRF_COOKIE', '')
+        )
+        self.etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        if request.user.is_authenticated or 'CSRF_COOKIE' in request.META:
+            self.last_modified = None
+        self.cache_control = {'no_cache': True}
+        if request.user.is_authenticated:
+            self.cache_control['private'] = True
+
+    def not_modified(self, request):
+        """Ответ 304 (или 412 для If-Match), если у клиента актуальная
+        версия страницы, иначе None."""
+        response = get_conditional_response(
+            request,
+            etag=self.etag,
+            last_modified=self.last_modified
+        )
+        if isinstance(response, HttpResponseNotModified):
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        # Без no-cache браузер сочтёт страницу свежей по Last-Modified
+        # и покажет её, не спрашивая сервер.
+        patch_cache_control(response, **self.cache_control)
+        return response
@@ -0,0 +1,102 @@
+"""Денормализованные счётчики UserStats и Post.comment_count.
+
+Счётчики меняются сигналами через UPDATE ... SET x = x + delta, то есть
+в той же транзакции, что и запись, вызвавшая сигнал. Если строки
+UserStats ещё нет, она создаётся пересчётом по исходным таблицам.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def actual_user_counts(user_id):
+    return {
+        field: model.objects.filter(**{f'{owner}_id': user_id}).count()
+        for field, (model, owner) in USER_COUNTERS.items()
+    }
+
+
+def get_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.update_or_create(
+            user_id=user.pk,
+            defaults=actual_user_counts(user.pk)
+        )
+        return stats
+
+
+def bump_user(user_id, field, delta):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults=actual_user_counts(user_id)
+        )
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta
+    )
+
+
+def _count_subquery(model, owner):
+    counts = model.objects.filter(
+        **{owner: OuterRef('pk')}
+    ).order_by().values(owner).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def user_counter_drift():
+    """Пары (UserStats, {поле: (сохранено, фактически)}) с расхождениями."""
+    users = User.objects.select_related('stats').annotate(**{
+        f'actual_{field}': _count_subquery(model, owner)
+        for field, (model, owner) in USER_COUNTERS.items()
+    })
+    for user in users.iterator():
+        missing = not hasattr(user, 'stats')
+        stats = UserStats(user_id=user.pk) if missing else user.stats
+        drift = {}
+        for field in USER_COUNTERS:
+            actual = getattr(user, f'actual_{field}')
+            if missing or getattr(stats, field) != actual:
+                drift[field] = (getattr(stats, field), actual)
+        if drift:
+            yield stats, drift
+
+
+def rebuild_all():
+    """Пересчитывает все счётчики заново. После массовой загрузки
+    в обход сигналов это быстрее, чем искать расхождения."""
+    UserStats.objects.all().delete()
+    users = User.objects.order_by().annotate(**{
+        f'actual_{field}': _count_subquery(model, owner)
+        for field, (model, owner) in USER_COUNTERS.items()
+    }).values_list('pk', *(f'actual_{field}' for field in USER_COUNTERS))
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=pk, **dict(zip(USER_COUNTERS, counts)))
+            for pk, *counts in users.iterator()
+        ),
+        batch_size=500,
+    )
+    Post.objects.update(comment_count=_count_subquery(Comment, 'post'))
+
+
+def comment_counter_drift():
+    """Пары (post_id, сохранено, фактически) с расхождениями."""
+    posts = Post.objects.order_by().annotate(
+        actual=_count_subquery(Comment, 'post')
+    ).exclude(comment_count=F('actual'))
+    return posts.values_list('pk', 'comment_count', 'actual').iterator()
@@ -0,0 +1,188 @@
+"""Бенчмарк профилей базы SQLite: конкурентные чтения и записи.
+
+Несколько процессов одновременно выполняют смесь запросов, как воркеры
+сервера: чтения — страница главной и порция комментариев записи,
+записи — добавление комментария в транзакции, как в add_comment
+(чтение записи, вставка, обновление счётчика), начатой так же, как
+это делает бэкенд профиля. Каждый профиль из
+settings.DATABASE_PROFILES получает свою копию одной и той же базы.
+Профиль без CONN_MAX_AGE открывает соединение на каждый запрос,
+как Django с настройками по умолчанию.
+
+Результат — число операций в секунду, число ошибок «database is
+locked» и перцентили времени операций в миллисекундах.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from yatube.db import apply_pragmas
+from yatube.metrics import percentiles
+
+from .models import Comment, Post, User
+
+INDEX_SQL = '''
+SELECT p.id, p.text, p.pub_date, p.comment_count, u.username, g.title
+FROM posts_post p
+JOIN auth_user u ON u.id = p.author_id
+LEFT JOIN posts_group g ON g.id = p.group_id
+ORDER BY p.pub_date DESC, p.id DESC
+LIMIT 10 OFFSET ?
+'''
+COMMENTS_SQL = '''
+SELECT c.id, c.text, c.depth, u.username
+FROM posts_comment c
+JOIN auth_user u ON u.id = c.author_id
+WHERE c.post_id = ?
+ORDER BY c.path
+LIMIT 21
+'''
+INDEX_PAGES = 20
+SAMPLE_IDS = 2000
+
+
+def snapshot(path, pragmas):
+    """Копия базы default в файл path с режимом журнала профиля."""
+    connection.ensure_connection()
+    target = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.connection.backup(target)
+        target.execute('PRAGMA journal_mode = {}'.format(
+            pragmas.get('journal_mode', 'DELETE')
+        )).fetchall()
+    finally:
+        target.close()
+
+
+def open_connection(path, pragmas):
+    # Ожидание блокировки по умолчанию — 5 секунд, как у Django.
+    db = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(db, pragmas)
+    return db
+
+
+def read(db, rng, ids):
+    if rng.random() < 0.5:
+        db.execute(INDEX_SQL, (rng.randrange(INDEX_PAGES) * 10,)).fetchall()
+    else:
+        db.execute(COMMENTS_SQL, (rng.choice(ids['posts']),)).fetchall()
+
+
+def begin_statement(profile):
+    """Начало транзакции, как у бэкенда профиля."""
+    wrapper = import_string(f"{profile['ENGINE']}.base.DatabaseWrapper")
+    return getattr(wrapper, 'begin_statement', 'BEGIN')
+
+
+def write(db, rng, ids, begin='BEGIN'):
+    post_id = rng.choice(ids['posts'])
+    db.execute(begin)
+    try:
+        db.execute(
+            'SELECT id, author_id FROM posts_post WHERE id = ?',
+            (post_id,)
+        ).fetchone()
+        comment_id = db.execute(
+            'INSERT INTO posts_comment '
+            '(text, created, author_id, post_id, path, depth) '
+            'VALUES (?, ?, ?, ?, ?, 0)',
+            (
+                'Комментарий бенчмарка',
+                datetime.utcnow().isoformat(' '),
+                rng.choice(ids['users']),
+                post_id,
+                '',
+            )
+        ).lastrowid
+        db.execute(
+            'UPDATE posts_comment SET path = ? WHERE id = ?',
+            (Comment.root_segment(comment_id), comment_id)
+        )
+        db.execute(
+            'UPDATE posts_post SET comment_count = comment_count + 1 '
+            'WHERE id = ?',
+            (post_id,)
+        )
+        db.execute('COMMIT')
+    except sqlite3.Error:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+
+
+def worker(task):
+    """Операции одного процесса до истечения seconds."""
+    path, profile, ids, seconds, writes, seed = task
+    rng = random.Random(seed)
+    begin = begin_statement(profile)
+    latencies = {'read': [], 'write': []}
+    locked = 0
+    db = None
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        kind = 'write' if rng.random() < writes else 'read'
+        start = time.perf_counter()
+        try:
+            if db is None:
+                db = open_connection(path, profile['PRAGMAS'])
+            if kind == 'write':
+                write(db, rng, ids, begin)
+            else:
+                read(db, rng, ids)
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+        else:
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+        if not profile['CONN_MAX_AGE'] and db is not None:
+            db.close()
+            db = None
+    if db is not None:
+        db.close()
+    return latencies, locked
+
+
+def sample_ids(seed):
+    rng = random.Random(seed)
+    posts = list(Post.objects.values_list('pk', flat=True)[:SAMPLE_IDS])
+    users = list(User.objects.values_list('pk', flat=True)[:SAMPLE_IDS])
+    if not posts or not users:
+        raise ValueError('В базе нет записей или пользователей')
+    rng.shuffle(posts)
+    return {'posts': posts, 'users': users}
+
+
+def run_profile(name, workers=4, seconds=5.0, writes=0.2, seed=0):
+    """Прогон профиля name на копии текущей базы."""
+    profile = settings.DATABASE_PROFILES[name]
+    ids = sample_ids(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'db.sqlite3')
+        snapshot(path, profile['PRAGMAS'])
+        # Процессы работают только со своими соединениями sqlite3;
+        # соединение Django не закрывается: база может быть в памяти.
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(worker, [
+                (path, profile, ids, seconds, writes, seed + number)
+                for number in range(workers)
+            ]))
+    reads = [value for result, _ in results for value in result['read']]
+    written = [value for result, _ in results for value in result['write']]
+    return {
+        'profile': name,
+        'reads': len(reads),
+        'writes': len(written),
+        'locked': sum(locked for _, locked in results),
+        'ops_per_second': round((len(reads) + len(written)) / seconds, 1),
+        'read_ms': percentiles(reads) if reads else {},
+        'write_ms': percentiles(written) if written else {},
+    }
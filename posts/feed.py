@@ -0,0 +1,172 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новая запись копируется в FeedItem каждого подписчика автора, поэтому
+follow_index листает курсором сами строки FeedItem по индексу
+(user, -pub_date, -post) и только потом загружает записи страницы
+по id. В гибридном режиме авторы, у которых подписчиков больше
+FEED_FANOUT_MAX_FOLLOWERS, не рассылаются: их записи подмешиваются
+в ленту при чтении, а лента читателя таких авторов собирается
+из таблицы записей.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .counters import get_stats
+from .models import FeedItem, Follow, Post, UserStats
+from .paginators import POSTS_PER_PAGE, CursorPaginator
+
+FEED_BATCH_SIZE = 500
+
+
+def _fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', None)
+
+
+def is_fanout_author(author):
+    limit = _fanout_limit()
+    if limit is None:
+        return True
+    # Счётчик читается из таблицы: author.stats, загруженный раньше,
+    # не видит подписок, сделанных после этого.
+    stats = UserStats.objects.filter(user_id=author.pk).first()
+    return (stats or get_stats(author)).followers_count <= limit
+
+
+def _celebrities_followed_by(user):
+    limit = _fanout_limit()
+    if limit is None:
+        return []
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=limit
+        ).values_list('author', flat=True)
+    )
+
+
+def fan_out_post(post):
+    if not is_fanout_author(post.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_feed(user, author):
+    if not is_fanout_author(author):
+        return
+    posts = author.posts.values_list('id', 'pub_date')
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user=user,
+                post_id=post_id,
+                author=author,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def returned_to_fanout(author_id):
+    """Число подписчиков автора только что опустилось до
+    FEED_FANOUT_MAX_FOLLOWERS: его записи снова рассылаются."""
+    limit = _fanout_limit()
+    if limit is None:
+        return False
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count',
+        flat=True
+    ).first()
+    return followers == limit
+
+
+def backfill_author(author_id):
+    """Раскладывает все записи автора по лентам подписчиков, у которых
+    их ещё нет: записи, опубликованные, пока автор не рассылался,
+    иначе пропали бы из лент, как только он вернулся к рассылке."""
+    feed = FeedItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} (user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            f'ON post.author_id = follow.author_id '
+            f'WHERE follow.author_id = %s AND NOT EXISTS ('
+            f'SELECT 1 FROM {feed} item '
+            f'WHERE item.user_id = follow.user_id AND item.post_id = post.id'
+            f')',
+            [author_id]
+        )
+
+
+def rebuild_feeds():
+    """Заполняет ленты заново одним INSERT ... SELECT, например после
+    массовой загрузки данных. Счётчики UserStats должны быть готовы."""
+    FeedItem.objects.all().delete()
+    sql = (
+        f'INSERT INTO {FeedItem._meta.db_table} '
+        f'(user_id, post_id, author_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+        f'FROM {Follow._meta.db_table} follow '
+        f'JOIN {Post._meta.db_table} post '
+        f'ON post.author_id = follow.author_id'
+    )
+    params = []
+    limit = _fanout_limit()
+    if limit is not None:
+        sql += (
+            f' JOIN {UserStats._meta.db_table} stats '
+            f'ON stats.user_id = follow.author_id '
+            f'WHERE stats.followers_count <= %s'
+        )
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def feed_page(user, params, posts=None, per_page=POSTS_PER_PAGE):
+    """Страница ленты user по курсору из params; записи берутся
+    из posts (по умолчанию Post.objects.for_cards())."""
+    if posts is None:
+        posts = Post.objects.for_cards()
+    celebrities = _celebrities_followed_by(user)
+    if celebrities:
+        inbox = FeedItem.objects.filter(user=user).values('post')
+        return CursorPaginator(
+            posts.filter(Q(pk__in=inbox) | Q(author__in=celebrities)),
+            per_page
+        ).get_page(params)
+    # Ключ курсора (pub_date, post_id) совпадает с ключом записей
+    # (pub_date, id), поэтому курсоры обеих веток взаимозаменяемы.
+    page = CursorPaginator(
+        FeedItem.objects.filter(user=user).only('pub_date', 'post'),
+        per_page,
+        keys=('pub_date', 'post_id')
+    ).get_page(params)
+    post_ids = [item.post_id for item in page.object_list]
+    found = posts.in_bulk(post_ids)
+    page.object_list = [found[pk] for pk in post_ids if pk in found]
+    return page
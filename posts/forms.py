@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import OversizedUpload, limit_image, too_large_error
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +14,20 @@ class PostForm(forms.ModelForm):
             'group': forms.Select(attrs={'class': 'col-md-12'}),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return limit_image(image)
+        return image
+
+    def clean(self):
+        upload = self.files.get(self.add_prefix('image'))
+        if isinstance(upload, OversizedUpload):
+            # ImageField уже отклонил пустую заглушку как «не изображение».
+            self._errors.pop('image', None)
+            self.add_error('image', too_large_error())
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark
+from posts.seeding import DatasetGenerator, seed_dataset
+
+
+def parse_mix(value):
+    """'index=50,post_view=50' -> {'index': 50, 'post_view': 50}"""
+    try:
+        mix = {
+            kind: int(weight)
+            for kind, weight in (
+                item.split('=') for item in value.split(',') if item
+            )
+        }
+    except ValueError:
+        raise CommandError(f'Неверный формат --mix: {value}')
+    unknown = set(mix) - set(benchmark.MIX)
+    if unknown:
+        raise CommandError(f"Неизвестные запросы: {', '.join(unknown)}")
+    return mix
+
+
+@contextmanager
+def temporary_cache():
+    """Пустой кеш по умолчанию того же типа на время прогона: версии,
+    страницы и карточки прошлого прогона с теми же id не дают
+    попаданий, а рабочий кеш не трогается."""
+    directory = tempfile.mkdtemp(prefix='yatube-benchmark-')
+    params = {
+        **settings.CACHES[DEFAULT_CACHE_ALIAS],
+        'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+    }
+    try:
+        with override_settings(CACHES={DEFAULT_CACHE_ALIAS: params}):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу данными заданного размера, прогоняет '
+        'смесь запросов через WSGI-приложение и сравнивает rps, '
+        'перцентили времени и число SQL-запросов с эталоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--mix',
+            type=parse_mix,
+            help='Веса запросов, например index=50,post_view=50.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON с эталоном: при регрессии команда завершится '
+                 'с ошибкой.',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            help='Сохранить результат как эталон в этот файл.',
+        )
+        parser.add_argument('--tolerance', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        # Данные бенчмарка живут во временной тестовой базе, а кеш —
+        # во временном файле (у locmem — под новым именем).
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False
+        )
+        try:
+            with temporary_cache():
+                result = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps(result, indent=2, ensure_ascii=False))
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline:
+                json.dump(result, baseline, indent=2, ensure_ascii=False)
+        if options['baseline']:
+            self.check_baseline(result, options)
+
+    def run_benchmark(self, options):
+        seed_dataset(DatasetGenerator(
+            seed=options['seed'],
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+        ))
+        return benchmark.run(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            seed=options['seed'],
+            mix=options['mix'],
+        )
+
+    def check_baseline(self, result, options):
+        with open(options['baseline']) as baseline:
+            regressions = benchmark.compare(
+                result,
+                json.load(baseline),
+                options['tolerance']
+            )
+        if regressions:
+            raise CommandError(
+                'Регрессия относительно эталона:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
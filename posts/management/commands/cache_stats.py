@@ -0,0 +1,38 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и вытеснения кеша по префиксам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить статистику после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'get_stats'):
+            raise CommandError(
+                f'Бэкенд {type(cache).__name__} не ведёт статистику.'
+            )
+        totals = cache.get_totals()
+        self.stdout.write(
+            f'Записей: {totals["entries"]}, байт: {totals["size"]}'
+        )
+        self.stdout.write(
+            f'{"prefix":40} {"hits":>10} {"misses":>10} '
+            f'{"evictions":>10} {"hit rate":>9}'
+        )
+        for prefix, stats in cache.get_stats().items():
+            reads = stats['hits'] + stats['misses']
+            hit_rate = stats['hits'] / reads if reads else 0
+            self.stdout.write(
+                f'{prefix:40} {stats["hits"]:>10} {stats["misses"]:>10} '
+                f'{stats["evictions"]:>10} {hit_rate:>9.1%}'
+            )
+        if options['reset']:
+            cache.reset_stats()
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import db_benchmark
+from posts.seeding import DatasetGenerator, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает профили базы SQLite (settings.DATABASE_PROFILES) '
+        'под смесью одновременных чтений и записей из нескольких '
+        'процессов: операции в секунду, ошибки «database is locked» '
+        'и время операций.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--writes',
+            type=float,
+            default=0.2,
+            help='Доля записей среди операций, от 0 до 1.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--profiles',
+            default='default,production',
+            help='Профили через запятую.',
+        )
+
+    def handle(self, *args, **options):
+        profiles = [name for name in options['profiles'].split(',') if name]
+        unknown = set(profiles) - set(settings.DATABASE_PROFILES)
+        if unknown:
+            raise CommandError(
+                f"Неизвестные профили: {', '.join(sorted(unknown))}"
+            )
+        if not 0 <= options['writes'] <= 1:
+            raise CommandError('--writes должно быть от 0 до 1')
+        # Как и benchmark, данные живут во временной тестовой базе;
+        # каждый профиль получает её копию в файле.
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False
+        )
+        try:
+            seed_dataset(DatasetGenerator(
+                seed=options['seed'],
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+            ))
+            results = [
+                db_benchmark.run_profile(
+                    name,
+                    workers=max(1, options['workers']),
+                    seconds=options['seconds'],
+                    writes=options['writes'],
+                    seed=options['seed'],
+                )
+                for name in profiles
+            ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for result in results:
+            self.stdout.write(
+                '{profile}: {ops_per_second} оп/с '
+                '(чтений {reads}, записей {writes}), '
+                'ошибок блокировки {locked}, '
+                'чтение {read_ms}, запись {write_ms} мс'.format(**result)
+            )
+        if len(results) > 1 and results[0]['ops_per_second']:
+            self.stdout.write('{} / {}: {:.1f}x'.format(
+                results[-1]['profile'],
+                results[0]['profile'],
+                results[-1]['ops_per_second'] / results[0]['ops_per_second']
+            ))
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import render_variants, save_variants
+
+
+def render(task):
+    post_id, image_name = task
+    try:
+        return post_id, render_variants(image_name), None
+    except Exception as error:
+        return post_id, None, f'{type(error).__name__}: {error}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт варианты изображений записей всех размеров и форматов. '
+        'Изображения обрабатываются параллельно в нескольких процессах, '
+        'в базу пишет только основной процесс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Пропускать записи, у которых варианты уже есть.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Число процессов, по умолчанию по числу ядер.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if options['missing']:
+            posts = posts.filter(image_variants__isnull=True)
+        tasks = list(posts.order_by('pk').values_list('pk', 'image'))
+        workers = max(1, min(options['workers'], len(tasks)))
+        if workers == 1:
+            results = map(render, tasks)
+        else:
+            # Дочерним процессам база не нужна: закрываем соединения,
+            # чтобы они не унаследовали открытые.
+            connections.close_all()
+            pool = ProcessPoolExecutor(workers, initializer=django.setup)
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = pool.map(render, tasks, chunksize=chunksize)
+        generated = failed = 0
+        try:
+            for post_id, variants, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Запись {post_id}: {error}')
+                    continue
+                save_variants(post_id, variants)
+                generated += 1
+        finally:
+            if workers > 1:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано записей: {generated}, с ошибками: {failed}.'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import comment_counter_drift, user_counter_drift
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики UserStats и Post.comment_count '
+        'и сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        drifted = 0
+        with transaction.atomic():
+            for stats, drift in user_counter_drift():
+                drifted += 1
+                details = ', '.join(
+                    f'{field}: {stored} -> {actual}'
+                    for field, (stored, actual) in drift.items()
+                )
+                self.stdout.write(f'user {stats.user_id}: {details}')
+                if not dry_run:
+                    for field, (stored, actual) in drift.items():
+                        setattr(stats, field, actual)
+                    stats.save()
+            for post_id, stored, actual in comment_counter_drift():
+                drifted += 1
+                self.stdout.write(
+                    f'post {post_id}: comment_count: {stored} -> {actual}'
+                )
+                if not dry_run:
+                    Post.objects.filter(pk=post_id).update(
+                        comment_count=actual
+                    )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+        elif dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'Расхождений: {drifted}.')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Исправлено расхождений: {drifted}.')
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполняет полнотекстовый индекс записей, например после '
+        'массовой загрузки данных в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только на SQLite.')
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано записей: {Post.objects.count()}.'
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube.replicas import replica_aliases, sync_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу в файлы реплик settings.DATABASE_REPLICAS '
+        '(YATUBE_DB_REPLICAS=N).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help=(
+                'Повторять копирование каждые N секунд; должно быть '
+                'меньше DATABASE_REPLICA_LAG.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_DB_REPLICAS.'
+            )
+        interval = options['interval']
+        while True:
+            sync_replicas(aliases)
+            self.stdout.write(
+                self.style.SUCCESS('Реплики обновлены: ' + ', '.join(aliases))
+            )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+from posts.paginators import elided_page_range
+from yatube.template_cache import build_engine, render_cost
+
+
+def sample_contexts():
+    """Контексты для шаблонов страниц из несохранённых объектов:
+    базе бенчмарк не нужен. Карточки записей на страницах рисуются
+    без кеша фрагментов (card_cache=False) тем же движком, что
+    и страница, иначе после первой отрисовки они брались бы из кеша
+    и сравнение загрузчиков показывало бы выигрыш кеша карточек."""
+    author = User(
+        id=1,
+        username='benchmark',
+        first_name='Лев',
+        last_name='Толстой'
+    )
+    group = Group(id=1, title='Классики', slug='classics')
+    now = timezone.now()
+    posts = [
+        Post(
+            id=number,
+            text='Все счастливые семьи похожи друг на друга. ' * 5,
+            author=author,
+            group=group,
+            pub_date=now,
+            comment_count=number % 3,
+        )
+        for number in range(1, 31)
+    ]
+    page = Paginator(posts, 10).page(2)
+    page.next_cursor = page.previous_cursor = 'MjAyMHwxMA=='
+    page.page_links = elided_page_range(page.number, 100000)
+    cards = {
+        'page_holes': True,
+        'card_cache': False,
+        'page': page,
+        'cache_version': 'bench',
+    }
+    return {
+        'includes/post_item.html': {'post': posts[0], 'page_holes': True},
+        'paginator.html': {'page': page, 'items': page},
+        'index.html': {**cards, 'page_number': page.number},
+        'profile.html': {
+            **cards,
+            'author': author,
+            'number_of_follower': 10,
+            'number_of_following': 5,
+            'posts_count': 30,
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость отрисовки шаблонов страниц без кеша '
+        'шаблонов (каждый раз чтение и разбор файлов, как при DEBUG) '
+        'и с загрузчиком cached. Карточки записей на страницах '
+        'рисуются заново при каждой отрисовке, без кеша фрагментов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200)
+
+    def handle(self, *args, **options):
+        renders = max(1, options['renders'])
+        uncached, cached = build_engine(False), build_engine(True)
+        for name, context in sample_contexts().items():
+            _, plain = render_cost(uncached, name, context, renders)
+            first, warm = render_cost(cached, name, context, renders)
+            cards = ' (карточки без кеша фрагментов)' if (
+                'card_cache' in context
+            ) else ''
+            self.stdout.write(
+                f'{name}{cards}: без кеша {plain * 1e6:.0f} мкс, '
+                f'с кешем {warm * 1e6:.0f} мкс '
+                f'(первая отрисовка {first * 1e6:.0f} мкс), '
+                f'быстрее в {plain / warm:.1f} раза'
+            )
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_TABLE = 'posts_post_search'
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+        f'text, group_title, author_name, '
+        f"tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Веса bm25 по колонкам: текст, название группы, имя автора.
+    schema_editor.execute(
+        f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) '
+        f"VALUES ('rank', 'bm25(1.0, 0.5, 2.0)')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {SEARCH_TABLE} '
+        f'(rowid, text, group_title, author_name) '
+        f"SELECT post.id, post.text, COALESCE(grp.title, ''), "
+        f"author.username || ' ' || author.first_name || ' ' "
+        f'|| author.last_name '
+        f'FROM {Post._meta.db_table} post '
+        f'JOIN {User._meta.db_table} author ON author.id = post.author_id '
+        f'LEFT JOIN {Group._meta.db_table} grp ON grp.id = post.group_id'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_imagevariant'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.6 on 2026-10-17 08:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEGMENT_WIDTH = 10
+
+
+def fill_root_paths(apps, schema_editor):
+    # До веток все комментарии — корни.
+    Comment = apps.get_model('posts', 'Comment')
+    batch = []
+    for comment in Comment.objects.only('pk').iterator():
+        comment.path = str(10 ** SEGMENT_WIDTH - 1 - comment.pk).zfill(
+            SEGMENT_WIDTH
+        )
+        batch.append(comment)
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=55),
+        ),
+        migrations.RunPython(fill_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+    ]
@@ -1,8 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.db import models
 
 User = get_user_model()
 
+COMMENT_SEGMENT_WIDTH = 10
+COMMENT_PATH_SEPARATOR = '.'
+# Следующий за разделителем символ: path < path + END для всей ветки.
+COMMENT_PATH_END = '/'
+MAX_COMMENT_DEPTH = 4
+MAX_COMMENT_REPLIES = 50
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -13,6 +21,15 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Всё, что читает includes/post_item.html: запись с автором и
+        группой одним запросом и варианты изображений вторым."""
+        return self.select_related('author', 'group').prefetch_related(
+            'image_variants'
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         help_text='Здесь напечатайте текст вашей публикации',
@@ -35,15 +52,88 @@ class Post(models.Model):
         null=True,
         verbose_name='Изображение'
     )
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            # id в конце индекса — порядок страниц (pub_date, id):
+            # без него SQLite досортировывает записи с равной датой.
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class ImageVariant(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    format = models.CharField(max_length=4)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(max_length=255)
+
+    class Meta:
+        # Варианты страницы загружаются одним запросом post_id IN (...):
+        # порядок (post_id, width) совпадает с индексом ограничения.
+        ordering = ['post_id', 'width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'width', 'format'],
+                name='unique_image_variant'
+            ),
+        ]
+
+    def __str__(self):
+        return self.file.name
+
+
+class CommentManager(models.Manager):
+    # Менеджер, а не QuerySet.as_manager(): выборки комментариев
+    # остаются обычными QuerySet.
+    def threaded(self):
+        """Комментарии в порядке веток: корни от новых к старым,
+        под каждым ответы по порядку; авторы тем же запросом."""
+        return self.select_related('author').order_by('path')
+
+    def subtree(self, comment):
+        """comment и все ответы на него, включая вложенные, в порядке
+        ветки — один диапазон по индексу (post, path)."""
+        return self.threaded().filter(
+            post_id=comment.post_id,
+            path__gte=comment.path,
+            path__lt=comment.path + COMMENT_PATH_END
+        )
+
+
 class Comment(models.Model):
+    """Комментарий или ответ на него.
+
+    Ветки хранятся материализованным путём: path — сегменты
+    фиксированной ширины от корня до самого комментария через точку,
+    поэтому сортировка по path выдаёт ветки целиком, а поддерево —
+    диапазон path. Сегмент ответа — его id, и ответы идут по порядку;
+    сегмент корня — id, дополненный до 10**COMMENT_SEGMENT_WIDTH - 1,
+    чтобы новые ветки были выше старых.
+    """
+
     text = models.TextField(
         help_text='Ведите текст',
         verbose_name='Текст коментария'
@@ -59,13 +149,77 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies'
+    )
+    path = models.CharField(
+        max_length=(MAX_COMMENT_DEPTH + 1) * (COMMENT_SEGMENT_WIDTH + 1),
+        default='',
+        editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CommentManager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx'
+            ),
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_post_path_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @staticmethod
+    def root_segment(pk):
+        return str(10 ** COMMENT_SEGMENT_WIDTH - 1 - pk).zfill(
+            COMMENT_SEGMENT_WIDTH
+        )
+
+    @property
+    def can_reply(self):
+        return self.depth < MAX_COMMENT_DEPTH
+
+    def clean(self):
+        if self.parent_id is None:
+            return
+        if self.parent.post_id != self.post_id:
+            raise ValidationError('Ответ должен относиться к той же записи')
+        if not self.parent.can_reply:
+            raise ValidationError('В этой ветке больше нельзя отвечать')
+        if self.parent.replies.count() >= MAX_COMMENT_REPLIES:
+            raise ValidationError('На этот комментарий уже много ответов')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.path:
+            return
+        # Путь включает собственный id, поэтому дописывается после
+        # вставки строки.
+        if self.parent_id is None:
+            self.depth, self.path = 0, self.root_segment(self.pk)
+        else:
+            self.depth = self.parent.depth + 1
+            self.path = COMMENT_PATH_SEPARATOR.join([
+                self.parent.path,
+                str(self.pk).zfill(COMMENT_SEGMENT_WIDTH)
+            ])
+        Comment.objects.filter(pk=self.pk).update(
+            path=self.path,
+            depth=self.depth
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -86,3 +240,55 @@ class Follow(models.Model):
                 name='unique_follow'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_item'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_post_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
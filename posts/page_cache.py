@@ -0,0 +1,228 @@
+"""Кеш страниц целиком с «дырками» под данные пользователя.
+
+Страницы index, group_posts, profile и post_view рисуются один раз для
+всех посетителей. Вместо того, что зависит от пользователя (меню
+в шапке, вкладки ленты, кнопки «Редактировать» и «Подписаться», форма
+комментария), тег {% page_hole %} оставляет метку
+<!--hole имя аргументы-->. Разметка с метками хранится в кеше под
+ключом из версии области кеша и адреса страницы с курсором, а перед
+ответом fill_holes() заменяет метки фрагментами для текущего
+пользователя. Метка начинается с «<», которого нет в экранированном
+тексте записей, поэтому подделать её нельзя.
+
+На остальных страницах тот же тег рисует фрагмент сразу.
+
+Карточки записей в списках ({% post_cards %}) кешируются отдельно,
+по одной на запись, под ключом из версии области записи: одна и та же
+карточка рисуется один раз для главной, группы, профиля и ленты.
+Кнопка «Редактировать» в карточке — тоже метка.
+
+Страницы и карточки, нарисованные по данным реплики (yatube.replicas),
+хранятся под отдельными ключами: реплика может отставать, и её копия
+не должна достаться тому, кто только что писал и читает с основной
+базы.
+"""
+import hashlib
+import re
+from urllib.parse import quote, unquote, urlencode
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends import locmem
+from django.http import HttpResponse
+from django.template import Context
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.replicas import read_alias
+
+from . import cache_versions
+from .forms import CommentForm
+from .models import Follow
+
+PAGE_PARAMS = ('page', 'after', 'before')
+CARD_TEMPLATE = 'includes/post_item.html'
+HOLE_RE = re.compile(r'<!--hole (\w+)((?: [^ >]*)*)-->')
+HOLES = {}
+
+
+def hole(name):
+    """Регистрирует функцию (request, context, *args) -> HTML фрагмента."""
+    def register(func):
+        HOLES[name] = func
+        return func
+    return register
+
+
+def hole_marker(name, args):
+    return mark_safe('<!--hole {}-->'.format(
+        ' '.join([name, *(quote(str(arg), safe='') for arg in args)])
+    ))
+
+
+def render_hole(request, name, args, context=None):
+    return HOLES[name](request, context or {}, *args)
+
+
+def fill_holes(request, html):
+    return HOLE_RE.sub(
+        lambda match: render_hole(
+            request,
+            match[1],
+            [unquote(arg) for arg in match[2].split()]
+        ),
+        html
+    )
+
+
+def _source():
+    return 'replica' if read_alias() else 'primary'
+
+
+def page_cache_key(request, version):
+    params = urlencode([
+        (name, request.GET.get(name, '')) for name in PAGE_PARAMS
+    ])
+    raw = f'{request.path}?{params}:{version}:{_source()}'
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _timeout():
+    timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 12)
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], locmem.LocMemCache):
+        # Кеш у каждого процесса свой: увеличение версии после записи
+        # видят не все воркеры, поэтому копии живут недолго.
+        return min(
+            timeout,
+            getattr(settings, 'LOCAL_PAGE_CACHE_TIMEOUT', 20)
+        )
+    return timeout
+
+
+def card_key(post, version):
+    # Имя автора и группа берутся из связанных объектов, поэтому
+    # тоже входят в ключ: переименование не меняет версию записи.
+    group = post.group
+    related = '{}:{}:{}:{}'.format(
+        post.author.username,
+        group.slug if group else '',
+        group.title if group else '',
+        _source()
+    )
+    return 'post_card:{}:{}:{}'.format(
+        post.pk,
+        version,
+        hashlib.md5(related.encode()).hexdigest()
+    )
+
+
+def render_cards(posts, engine=None, use_cache=True):
+    """HTML карточек posts с метками вместо кнопок пользователя:
+    из кеша одним get_many, недостающие рисуются движком engine
+    (по умолчанию общим) и сохраняются. use_cache=False рисует все
+    карточки заново и ничего не сохраняет."""
+    # У Page берётся object_list: обход самой страницы заменил бы
+    # в ней QuerySet списком.
+    posts = list(getattr(posts, 'object_list', posts))
+    if not use_cache:
+        return ''.join(_render_card(post, engine) for post in posts)
+    versions = cache_versions.get_versions(
+        cache_versions.post_scope(post.pk) for post in posts
+    )
+    keys = [
+        card_key(post, versions[cache_versions.post_scope(post.pk)])
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            cards[key] = missing[key] = _render_card(post, engine)
+    if missing:
+        cache.set_many(missing, _timeout())
+    return ''.join(cards[key] for key in keys)
+
+
+def _render_card(post, engine):
+    context = {'post': post, 'page_holes': True}
+    if engine is None:
+        return render_to_string(CARD_TEMPLATE, context)
+    return engine.get_template(CARD_TEMPLATE).render(Context(context))
+
+
+def cached_page(request, version, render_page):
+    """Страница из кеша, а при промахе — render_page(), нарисованная
+    с page_holes в контексте. Метки заполняются в обоих случаях."""
+    key = page_cache_key(request, version)
+    html = cache.get(key)
+    if html is None:
+        response = render_page()
+        if response.status_code != 200:
+            return response
+        html = response.content.decode(response.charset)
+        cache.set(key, html, _timeout())
+    else:
+        response = HttpResponse()
+    response.content = fill_holes(request, html)
+    return response
+
+
+@hole('nav')
+def nav_hole(request, context):
+    return render_to_string('includes/nav_user.html', request=request)
+
+
+@hole('menu')
+def menu_hole(request, context, active):
+    return render_to_string(
+        'includes/menu.html',
+        {active: True},
+        request=request
+    )
+
+
+@hole('edit')
+def edit_hole(request, context, username, post_id):
+    if request.user.username != username:
+        return ''
+    return render_to_string(
+        'includes/edit_button.html',
+        {'username': username, 'post_id': post_id},
+        request=request
+    )
+
+
+@hole('follow')
+def follow_hole(request, context, username):
+    user = request.user
+    if not user.is_authenticated or user.username == username:
+        return ''
+    following = Follow.objects.filter(
+        user=user,
+        author__username=username
+    ).exists()
+    return render_to_string(
+        'includes/follow_button.html',
+        {'username': username, 'following': following},
+        request=request
+    )
+
+
+@hole('comment_form')
+def comment_form_hole(request, context, username, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    form = context.get('form') or CommentForm()
+    # Ответ: родитель из отправленной формы или из ссылки «Ответить»
+    # (?reply_to=id), которая не входит в ключ кеша страницы.
+    parent = form.instance.parent_id or request.GET.get('reply_to', '')
+    return render_to_string(
+        'includes/comment_form.html',
+        {
+            'username': username,
+            'post_id': post_id,
+            'form': form,
+            'parent': str(parent) if str(parent).isdigit() else '',
+        },
+        request=request
+    )
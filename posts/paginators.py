@@ -0,0 +1,186 @@
+import base64
+import binascii
+import math
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+CURSOR_SEPARATOR = '|'
+
+
+class CursorPaginator:
+    """Keyset-пагинация по полям keys (по умолчанию pub_date, id).
+
+    Страница выбирается условием WHERE по ключу последней (after) или
+    первой (before) записи соседней страницы, поэтому стоимость запроса
+    не зависит от глубины и не требует COUNT(*). Параметр ?page=N без
+    курсора обрабатывается через OFFSET, чтобы старые ссылки работали.
+
+    get_page() возвращает обычные Page и Paginator: в paginator.count
+    и paginator.num_pages записана нижняя граница, достаточная для
+    has_next()/has_previous(). Если view знает точное число записей
+    (count, например из денормализованных счётчиков), страницы
+    нумеруются по нему и в page.page_links попадают номера для
+    навигации; без count навигация только «назад» и «вперёд».
+
+    С descending=False записи идут по возрастанию ключа.
+    """
+
+    def __init__(self, object_list, per_page=POSTS_PER_PAGE,
+                 keys=('pub_date', 'id'), count=None, descending=True):
+        self.keys = keys
+        self.per_page = per_page
+        self.count = count
+        self.forward, self.backward = ('lt', 'gt') if descending else (
+            'gt', 'lt'
+        )
+        order, reverse = ('-', '') if descending else ('', '-')
+        self.object_list = object_list.order_by(
+            *(f'{order}{key}' for key in keys)
+        )
+        self.reverse_order = [f'{reverse}{key}' for key in keys]
+
+    def encode_cursor(self, obj):
+        raw = CURSOR_SEPARATOR.join(
+            str(getattr(obj, key)) for key in self.keys
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token.encode()).decode()
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        parts = raw.split(CURSOR_SEPARATOR, len(self.keys) - 1)
+        if len(parts) != len(self.keys):
+            return None
+        opts = self.object_list.model._meta
+        try:
+            values = [
+                opts.get_field(key).to_python(part)
+                for key, part in zip(self.keys, parts)
+            ]
+        except ValidationError:
+            return None
+        if None in values:
+            return None
+        return values
+
+    def _beyond(self, values, lookup, inclusive=False):
+        """Условие «строго за ключом values» в направлении lookup."""
+        condition = Q()
+        for position in range(len(self.keys) - 1, -1, -1):
+            key = self.keys[position]
+            equal = {k: v for k, v in zip(self.keys[:position], values)}
+            last = position == len(self.keys) - 1
+            suffix = f'{lookup}e' if inclusive and last else lookup
+            condition |= Q(**equal, **{f'{key}__{suffix}': values[position]})
+        return condition
+
+    @staticmethod
+    def validate_number(number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return max(number, 1)
+
+    def get_page(self, params):
+        number = self.validate_number(params.get('page'))
+        after = self.decode_cursor(params.get('after'))
+        before = self.decode_cursor(params.get('before'))
+        window = self.object_list
+        if after is not None:
+            window = window.filter(self._beyond(after, self.forward))
+        elif before is not None:
+            reversed_window = window.filter(
+                self._beyond(before, self.backward)
+            ).order_by(*self.reverse_order)
+            edge = reversed_window.values_list(*self.keys)[
+                self.per_page - 1:self.per_page
+            ]
+            edge = list(edge)
+            if edge:
+                window = window.filter(
+                    self._beyond(edge[0], self.forward, inclusive=True)
+                )
+            else:
+                number = 1
+        elif number > 1:
+            if self.count is not None:
+                number = min(number, last_page(self.count, self.per_page))
+            window = window[(number - 1) * self.per_page:]
+        return self._build_page(window, number)
+
+    def _build_page(self, window, number):
+        # Одна лишняя строка показывает, есть ли следующая страница,
+        # без отдельного запроса. Из кеша выборки она убирается, так что
+        # object_list остаётся QuerySet ровно с записями страницы
+        # (и без повторных запросов prefetch_related).
+        object_list = window[:self.per_page + 1]
+        rows = list(object_list)
+        has_next = len(rows) > self.per_page
+        rows = object_list._result_cache = rows[:self.per_page]
+        page = make_page(
+            object_list, len(rows), number, has_next, self.per_page,
+            self.count
+        )
+        page.next_cursor = self.encode_cursor(rows[-1]) if has_next else ''
+        page.previous_cursor = (
+            self.encode_cursor(rows[0]) if rows and number > 1 else ''
+        )
+        return page
+
+
+def last_page(count, per_page):
+    return max(1, math.ceil(count / per_page))
+
+
+def elided_page_range(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц для навигации: on_ends первых и последних
+    и on_each_side по сторонам от текущей; пропуск обозначен None."""
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    numbers = []
+    if number > on_each_side + on_ends + 2:
+        numbers += [*range(1, on_ends + 1), None]
+        numbers += range(number - on_each_side, number + 1)
+    else:
+        numbers += range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        numbers += range(number + 1, number + on_each_side + 1)
+        numbers += [None, *range(num_pages - on_ends + 1, num_pages + 1)]
+    else:
+        numbers += range(number + 1, num_pages + 1)
+    return numbers
+
+
+def make_page(object_list, rows, number, has_next, per_page, count=None):
+    """Page страницы number, на которой rows записей.
+
+    Без count (курсорный режим) число страниц — нижняя граница:
+    текущая и, если есть, следующая. Точный count задаёт число страниц
+    и номера для навигации в page.page_links. Счётчик может отстать
+    от таблицы, поэтому наличие следующей страницы всё равно берётся
+    из выборки.
+    """
+    paginator = Paginator(object_list, per_page)
+    paginator.count = (number - 1) * per_page + rows + int(has_next)
+    paginator.num_pages = number + int(has_next)
+    page_links = []
+    if count is not None and has_next:
+        paginator.count = max(paginator.count, count)
+        paginator.num_pages = max(
+            paginator.num_pages,
+            last_page(paginator.count, per_page)
+        )
+    if count is not None and paginator.num_pages > 1:
+        page_links = elided_page_range(number, paginator.num_pages)
+    page = Page(object_list, number, paginator)
+    page.page_links = page_links
+    return page
@@ -0,0 +1,222 @@
+"""Полнотекстовый поиск по записям.
+
+На SQLite поиск идёт по виртуальной таблице FTS5 posts_post_search
+(rowid — id записи) с колонками text, group_title и author_name.
+Таблицу создаёт миграция 0013, а сигналы обновляют её при изменении
+записей, групп и авторов. Результаты упорядочены по bm25: совпадение
+в имени автора весит больше, чем в тексте, в названии группы — меньше.
+Страницы выбираются курсором по паре (rank, id), как в CursorPaginator,
+без COUNT(*) и OFFSET. На других СУБД поиск сводится к icontains.
+"""
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Group, Post, User
+from .paginators import (
+    CURSOR_SEPARATOR, POSTS_PER_PAGE, CursorPaginator, make_page
+)
+
+SEARCH_TABLE = 'posts_post_search'
+SNIPPET_TOKENS = 24
+# snippet() отмечает совпадения этими символами: текст экранируется
+# целиком, и только потом маркеры заменяются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+TERM_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Ввод пользователя -> выражение MATCH: все слова, каждое как
+    префикс. Кавычки не дают ввести синтаксис FTS5 (OR, NEAR, column:)."""
+    return ' '.join(f'"{term}"*' for term in TERM_RE.findall(query))
+
+
+def _reindex(where, params):
+    post = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN '
+            f'(SELECT post.id FROM {post} post WHERE {where})',
+            params
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} '
+            f'(rowid, text, group_title, author_name) '
+            f"SELECT post.id, post.text, COALESCE(grp.title, ''), "
+            f"author.username || ' ' || author.first_name || ' ' "
+            f'|| author.last_name '
+            f'FROM {post} post '
+            f'JOIN {User._meta.db_table} author '
+            f'ON author.id = post.author_id '
+            f'LEFT JOIN {Group._meta.db_table} grp '
+            f'ON grp.id = post.group_id '
+            f'WHERE {where}',
+            params
+        )
+
+
+def index_posts(post_ids):
+    if not is_available():
+        return
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), 500):
+        chunk = post_ids[start:start + 500]
+        _reindex(
+            'post.id IN ({})'.format(', '.join(['%s'] * len(chunk))),
+            chunk
+        )
+
+
+def index_group(group_id):
+    if is_available():
+        _reindex('post.group_id = %s', [group_id])
+
+
+def index_author(author_id):
+    if is_available():
+        _reindex('post.author_id = %s', [author_id])
+
+
+def rebuild_index():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    _reindex('1 = 1', [])
+
+
+def unindex_posts(post_ids):
+    if not is_available():
+        return
+    post_ids = list(post_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(post_ids), 500):
+            chunk = post_ids[start:start + 500]
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({{}})'.format(
+                    ', '.join(['%s'] * len(chunk))
+                ),
+                chunk
+            )
+
+
+def filter_posts(queryset, query):
+    """queryset, ограниченный записями, которые находит query."""
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(
+            Q(text__icontains=query)
+            | Q(group__title__icontains=query)
+            | Q(author__username__icontains=query)
+        )
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [match]
+    ))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def encode_cursor(post):
+    raw = f'{post.search_rank!r}{CURSOR_SEPARATOR}{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        rank, pk = raw.split(CURSOR_SEPARATOR)
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def _matches(match, cursor=None, backward=False, limit=POSTS_PER_PAGE,
+             offset=0):
+    """[(id, rank, snippet)] в порядке выдачи (или обратном)."""
+    sql = (
+        f'SELECT rowid, rank, '
+        f'snippet({SEARCH_TABLE}, -1, %s, %s, %s, %s) '
+        f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+    )
+    params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS, match]
+    if cursor is not None:
+        if backward:
+            sql += 'AND (rank < %s OR (rank = %s AND rowid > %s)) '
+        else:
+            sql += 'AND (rank > %s OR (rank = %s AND rowid < %s)) '
+        rank, pk = cursor
+        params += [rank, rank, pk]
+    if backward:
+        sql += 'ORDER BY rank DESC, rowid LIMIT %s OFFSET %s'
+    else:
+        sql += 'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return db_cursor.fetchall()
+
+
+def search_page(query, params, per_page=POSTS_PER_PAGE):
+    """Страница результатов с next_cursor/previous_cursor, как у
+    CursorPaginator.get_page(); у записей есть search_snippet."""
+    if not is_available():
+        return CursorPaginator(
+            filter_posts(Post.objects.for_cards(), query),
+            per_page
+        ).get_page(params)
+    match = build_match(query)
+    number = CursorPaginator.validate_number(params.get('page'))
+    after = decode_cursor(params.get('after'))
+    before = decode_cursor(params.get('before'))
+    rows = None
+    if match and after is None and before is not None:
+        previous = _matches(match, before, True, per_page + 1)
+        if len(previous) > per_page:
+            rows, has_next = previous[:per_page][::-1], True
+        else:
+            number = 1
+    if match and rows is None:
+        offset = 0 if after is not None else (number - 1) * per_page
+        rows = _matches(match, after, False, per_page + 1, offset)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+    if not rows:
+        rows, has_next, number = [], False, 1
+    posts = Post.objects.for_cards().in_bulk([row[0] for row in rows])
+    object_list = []
+    for pk, rank, snippet in rows:
+        if pk in posts:
+            post = posts[pk]
+            post.search_rank = rank
+            post.search_snippet = highlight(snippet)
+            object_list.append(post)
+    page = make_page(object_list, len(rows), number, has_next, per_page)
+    page.next_cursor = (
+        encode_cursor(object_list[-1]) if has_next and object_list else ''
+    )
+    page.previous_cursor = (
+        encode_cursor(object_list[0]) if object_list and number > 1 else ''
+    )
+    return page
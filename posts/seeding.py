@@ -0,0 +1,389 @@
+"""Генерация тестовых данных для бенчмарков и нагрузочных проверок.
+
+Строки вставляются пачками через executemany с заранее вычисленными
+id, в обход ORM и сигналов. Денормализованные данные (счётчики, ленты,
+поисковый индекс) пересчитываются в конце одним проходом.
+
+Граф подписок степенной: на автора с рангом популярности r подписываются
+с вероятностью ~ 1 / r ** FOLLOW_ALPHA, поэтому у немногих авторов
+тысячи подписчиков, а у большинства — единицы. Так же распределены и
+записи по авторам, но со своим порядком рангов: самые читаемые авторы
+не обязательно самые плодовитые, иначе ленты подписчиков вырастают
+на порядки больше, чем в жизни. Каждая пачка строк генерируется своим Random от
+(seed, таблица, номер пачки), поэтому результат зависит только от seed
+и размеров, а не от порядка или числа процессов генерации: пачки
+можно строить в нескольких процессах, а вставляет их основной.
+
+Даты отсчитываются назад от SEED_EPOCH, а не от текущего времени, а id
+продолжают наибольшие id в базе: на пустой базе повторный запуск
+с теми же параметрами даёт те же значения во всех столбцах.
+
+Изображения записей берутся из небольшого набора IMAGE_POOL файлов,
+которые write_images() рисует от того же seed.
+"""
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import counters, feed, search
+from .models import Comment, FeedItem, Follow, Group, Post, User
+
+CHUNK_SIZE = 10000
+FOLLOW_ALPHA = 1.1
+GROUP_SHARE = 0.6
+HISTORY = timedelta(days=365)
+IMAGE_POOL = 20
+IMAGE_SIZE = (1280, 720)
+SEED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SEED_PASSWORD = 'yatube-seed'
+WORDS = (
+    'жизнь', 'город', 'утро', 'дорога', 'книга', 'море', 'друг', 'вечер',
+    'работа', 'музыка', 'кофе', 'снег', 'лето', 'поезд', 'кино', 'сад',
+    'река', 'идея', 'проект', 'код', 'кошка', 'собака', 'чай', 'парк',
+    'новость', 'фото', 'история', 'мечта', 'праздник', 'прогулка',
+    'сегодня', 'вчера', 'снова', 'очень', 'просто', 'наконец', 'опять',
+    'красивый', 'тихий', 'новый', 'старый', 'большой', 'смешной',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Лев', 'Нина')
+LAST_NAMES = ('Иванова', 'Петров', 'Смирнова', 'Толстой', 'Орлова')
+TABLES = ('users', 'groups', 'posts', 'comments', 'follows')
+COLUMNS = {
+    'users': (User, (
+        'id', 'password', 'is_superuser', 'username', 'first_name',
+        'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+    )),
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+    'posts': (Post, (
+        'id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+        'comment_count',
+    )),
+    'comments': (Comment, (
+        'id', 'text', 'created', 'author_id', 'post_id', 'path', 'depth',
+    )),
+    'follows': (Follow, ('user_id', 'author_id')),
+}
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class DatasetGenerator:
+    """Описание набора данных; rows() строит одну пачку строк таблицы."""
+
+    def __init__(self, seed=0, users=100, groups=10, posts=1000,
+                 comments=2000, follows=20, images=0.0, first_ids=None,
+                 now=None):
+        self.seed = seed
+        self.counts = {
+            'users': users,
+            'groups': groups,
+            'posts': posts,
+            'comments': comments,
+            'follows': users,
+        }
+        self.follows = follows
+        self.images = images
+        self.first_ids = first_ids or {
+            table: _next_id(COLUMNS[table][0])
+            for table in ('users', 'groups', 'posts', 'comments')
+        }
+        self.now = now or SEED_EPOCH
+        self.password = make_password(SEED_PASSWORD, salt=f'seed{seed}')
+        self._rankings = {}
+
+    def params(self):
+        """Аргументы, по которым другой процесс построит такой же
+        генератор."""
+        return {
+            'seed': self.seed,
+            'users': self.counts['users'],
+            'groups': self.counts['groups'],
+            'posts': self.counts['posts'],
+            'comments': self.counts['comments'],
+            'follows': self.follows,
+            'images': self.images,
+            'first_ids': self.first_ids,
+            'now': self.now,
+        }
+
+    def image_names(self):
+        if not self.images:
+            return []
+        return [
+            f'posts/seed/{self.seed}-{number}.jpg'
+            for number in range(IMAGE_POOL)
+        ]
+
+    def chunks(self, table):
+        return range(-(-self.counts[table] // CHUNK_SIZE))
+
+    def _rng(self, table, chunk):
+        return random.Random(f'{self.seed}:{table}:{chunk}')
+
+    def _span(self, table, chunk):
+        start = chunk * CHUNK_SIZE
+        return range(start, min(start + CHUNK_SIZE, self.counts[table]))
+
+    def ranking(self, kind):
+        """(id пользователей по убыванию ранга, накопленные веса);
+        kind — 'followers' или 'posts', у каждого свой порядок."""
+        if kind not in self._rankings:
+            first = self.first_ids['users']
+            ids = list(range(first, first + self.counts['users']))
+            random.Random(f'{self.seed}:{kind}').shuffle(ids)
+            weights = accumulate(
+                1 / rank ** FOLLOW_ALPHA for rank in range(1, len(ids) + 1)
+            )
+            self._rankings[kind] = (ids, list(weights))
+        return self._rankings[kind]
+
+    def _ranked_users(self, rng, kind, k):
+        ids, weights = self.ranking(kind)
+        return rng.choices(ids, cum_weights=weights, k=k)
+
+    def _text(self, rng, low, high):
+        words = rng.choices(WORDS, k=rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def post_date(self, index):
+        step = HISTORY / max(self.counts['posts'], 1)
+        return self.now - HISTORY + step * index
+
+    def rows(self, table, chunk):
+        return getattr(self, f'_{table}')(
+            self._rng(table, chunk),
+            self._span(table, chunk)
+        )
+
+    def _users(self, rng, span):
+        first = self.first_ids['users']
+        return [
+            (
+                first + index, self.password, False, f'user{first + index}',
+                rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), '',
+                False, True, self.now - HISTORY,
+            )
+            for index in span
+        ]
+
+    def _groups(self, rng, span):
+        first = self.first_ids['groups']
+        return [
+            (
+                first + index, f'Сообщество {first + index}',
+                f'group-{first + index}', self._text(rng, 5, 20),
+            )
+            for index in span
+        ]
+
+    def _posts(self, rng, span):
+        first = self.first_ids['posts']
+        authors = self._ranked_users(rng, 'posts', len(span))
+        first_group = self.first_ids['groups']
+        images = self.image_names()
+        rows = []
+        for index, author_id in zip(span, authors):
+            group_id = None
+            if self.counts['groups'] and rng.random() < GROUP_SHARE:
+                group_id = first_group + rng.randrange(self.counts['groups'])
+            image = ''
+            if images and rng.random() < self.images:
+                image = rng.choice(images)
+            rows.append((
+                first + index, self._text(rng, 8, 60), self.post_date(index),
+                author_id, group_id, image, 0,
+            ))
+        return rows
+
+    def _comments(self, rng, span):
+        first = self.first_ids['comments']
+        first_post = self.first_ids['posts']
+        first_user = self.first_ids['users']
+        rows = []
+        for index in span:
+            post = rng.randrange(self.counts['posts'])
+            rows.append((
+                first + index, self._text(rng, 3, 25),
+                self.post_date(post) + timedelta(minutes=rng.randint(1, 900)),
+                first_user + rng.randrange(self.counts['users']),
+                first_post + post, Comment.root_segment(first + index), 0,
+            ))
+        return rows
+
+    def _follows(self, rng, span):
+        """Подписки пользователей из span; id строк назначает база,
+        потому что их число заранее неизвестно."""
+        first_user = self.first_ids['users']
+        limit = min(self.follows * 2, self.counts['users'] - 1)
+        rows = []
+        for index in span:
+            user_id = first_user + index
+            wanted = rng.randint(0, limit)
+            authors = set(
+                self._ranked_users(rng, 'followers', wanted * 2)
+            )
+            authors.discard(user_id)
+            for author_id in sorted(authors)[:wanted]:
+                rows.append((user_id, author_id))
+        return rows
+
+
+def write_images(generator):
+    """Рисует файлы из generator.image_names(), которых ещё нет."""
+    for name in generator.image_names():
+        if default_storage.exists(name):
+            continue
+        rng = random.Random(f'{generator.seed}:{name}')
+        image = Image.new(
+            'RGB',
+            IMAGE_SIZE,
+            tuple(rng.randrange(256) for _ in range(3))
+        )
+        draw = ImageDraw.Draw(image)
+        width, height = IMAGE_SIZE
+        for _ in range(12):
+            left, top = rng.randrange(width), rng.randrange(height)
+            draw.ellipse(
+                (left, top, left + rng.randint(50, 400),
+                 top + rng.randint(50, 400)),
+                fill=tuple(rng.randrange(256) for _ in range(3))
+            )
+        content = BytesIO()
+        image.save(content, 'JPEG', quality=85)
+        default_storage.save(name, ContentFile(content.getvalue()))
+
+
+def insert_rows(table, rows):
+    model, columns = COLUMNS[table]
+    quote = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    rows = [
+        [adapt(value) if hasattr(value, 'tzinfo') else value
+         for value in row]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """Снимает индексы таблиц на время массовой вставки и создаёт их
+    заново в конце: построить индекс по готовой таблице намного
+    быстрее, чем обновлять его на каждой строке. Только для SQLite."""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name, sql FROM sqlite_master WHERE type = %s '
+            'AND sql IS NOT NULL AND tbl_name IN ({})'.format(
+                ', '.join(['%s'] * len(tables))
+            ),
+            ['index', *tables]
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def finalize():
+    """Пересчитывает то, что обычно поддерживают сигналы."""
+    counters.rebuild_all()
+    feed.rebuild_feeds()
+    search.rebuild_index()
+
+
+_worker_generator = None
+
+
+def _init_worker(params):
+    global _worker_generator
+    django.setup()
+    _worker_generator = DatasetGenerator(**params)
+
+
+def _worker_rows(table, chunk):
+    return _worker_generator.rows(table, chunk)
+
+
+def _batches(generator, table, pool, workers):
+    """Пачки строк таблицы по порядку. В работе не больше 2 * workers
+    пачек, чтобы готовые не копились в памяти, пока идёт вставка;
+    если вставка прервалась, ещё не начатые пачки отменяются."""
+    if pool is None:
+        for chunk in generator.chunks(table):
+            yield generator.rows(table, chunk)
+        return
+    pending = deque()
+    try:
+        for chunk in generator.chunks(table):
+            pending.append(pool.submit(_worker_rows, table, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def seed_dataset(generator, progress=None, workers=1):
+    """Заполняет базу; при workers > 1 пачки строк строят дочерние
+    процессы, а в базу пишет только основной. Результат от числа
+    процессов не зависит."""
+    write_images(generator)
+    pool = None
+    if workers > 1:
+        # Дочерним процессам база не нужна: закрываем соединения,
+        # чтобы они не унаследовали открытые.
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(generator.params(),)
+        )
+    try:
+        with transaction.atomic():
+            with deferred_indexes(Post, Comment, Follow):
+                for table in TABLES:
+                    batches = _batches(generator, table, pool, workers)
+                    with closing(batches):
+                        for chunk, rows in zip(
+                            generator.chunks(table), batches
+                        ):
+                            insert_rows(table, rows)
+                            if progress:
+                                progress(table, chunk, len(rows))
+            with deferred_indexes(FeedItem):
+                finalize()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return generator
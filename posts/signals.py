@@ -0,0 +1,169 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import cache_versions, counters, feed, search
+from .models import Comment, Follow, Group, Post, User
+
+AUTHOR_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        feed.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        feed.add_author_to_feed(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed_on_unfollow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    feed.remove_author_from_feed(instance.user_id, instance.author_id)
+    if feed.returned_to_fanout(instance.author_id):
+        feed.backfill_author(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = cache_versions.post_scopes(
+        instance.pk,
+        instance.author_id,
+        instance.group_id
+    )
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id and previous_group_id != instance.group_id:
+        scopes.append(cache_versions.group_scope(previous_group_id))
+    cache_versions.invalidate(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'pk',
+        'author_id',
+        'group_id'
+    ).first()
+    if post is not None:
+        cache_versions.invalidate(*cache_versions.post_scopes(*post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    cache_versions.invalidate(
+        cache_versions.profile_scope(instance.author_id),
+        cache_versions.profile_scope(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_posts([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+def index_group_posts(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_group(instance.pk)
+        # Название группы есть в карточках на главной, в ленте,
+        # в профилях и на страницах записей её авторов.
+        authors = instance.posts.order_by().values_list(
+            'author_id',
+            flat=True
+        ).distinct()
+        cache_versions.invalidate(
+            cache_versions.index_scope(),
+            cache_versions.group_scope(instance.pk),
+            *(cache_versions.profile_scope(pk) for pk in authors)
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    search.index_posts(getattr(instance, '_post_ids', []))
+
+
+@receiver(pre_save, sender=User)
+def remember_author_name(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    instance._previous_name = None
+    if not instance.pk or raw:
+        return
+    if update_fields is None or AUTHOR_NAME_FIELDS & set(update_fields):
+        instance._previous_name = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*sorted(AUTHOR_NAME_FIELDS)).first()
+
+
+@receiver(post_save, sender=User)
+def index_author_posts(sender, instance, created, raw=False, **kwargs):
+    # Вход пользователя сохраняет только last_login: переиндексация
+    # и сброс страниц нужны, лишь когда изменилось имя.
+    previous = getattr(instance, '_previous_name', None)
+    if created or raw or previous is None:
+        return
+    name = tuple(getattr(instance, field) for field in sorted(
+        AUTHOR_NAME_FIELDS
+    ))
+    if name == previous:
+        return
+    search.index_author(instance.pk)
+    # Имя автора есть в карточках на главной, в ленте и на страницах
+    # групп, где он писал.
+    groups = instance.posts.exclude(group=None).order_by().values_list(
+        'group_id',
+        flat=True
+    ).distinct()
+    cache_versions.invalidate(
+        cache_versions.index_scope(),
+        cache_versions.profile_scope(instance.pk),
+        *(cache_versions.group_scope(pk) for pk in groups)
+    )
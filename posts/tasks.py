@@ -0,0 +1,17 @@
+from jobs.queue import task
+
+from . import cache_versions
+from .models import Post
+from .thumbnails import generate_post_thumbnails
+
+
+@task('posts.generate_thumbnails')
+def generate_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        generate_post_thumbnails(post)
+
+
+@task('posts.bump_cache_versions')
+def bump_cache_versions(*scopes):
+    cache_versions.bump(*scopes)
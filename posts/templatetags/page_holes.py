@@ -0,0 +1,33 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.page_cache import (
+    fill_holes, hole_marker, render_cards, render_hole
+)
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, name, *args):
+    """Фрагмент для текущего пользователя; при отрисовке страницы
+    для кеша (page_holes в контексте) — метка под него."""
+    if context.get('page_holes'):
+        return hole_marker(name, args)
+    return render_hole(context.request, name, args, context.flatten())
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки записей из кеша карточек, нарисованные тем же движком,
+    что и страница; кнопки пользователя заполняются сразу, если
+    страница целиком не кешируется. card_cache=False в контексте
+    отключает кеш карточек (для бенчмарка шаблонов)."""
+    html = render_cards(
+        posts,
+        context.template.engine,
+        context.get('card_cache', True)
+    )
+    if not context.get('page_holes'):
+        html = fill_holes(context.request, html)
+    return mark_safe(html)
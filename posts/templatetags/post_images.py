@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import picture_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    return picture_sources(post)
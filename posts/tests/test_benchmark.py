@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts import benchmark, db_benchmark
+from posts.counters import comment_counter_drift, user_counter_drift
+from posts.models import Comment, FeedItem, Follow, Group, Post, User
+from posts.seeding import DatasetGenerator, seed_dataset
+
+
+class SeedingTests(TestCase):
+    def test_seed_is_deterministic_and_consistent(self):
+        """Набор данных зависит только от seed, счётчики и ленты
+        пересчитаны"""
+        generator = DatasetGenerator(
+            seed=7,
+            users=30,
+            groups=3,
+            posts=200,
+            comments=300,
+            follows=5
+        )
+        again = DatasetGenerator(
+            seed=7,
+            users=30,
+            groups=3,
+            posts=200,
+            comments=300,
+            follows=5,
+            first_ids=generator.first_ids,
+            now=generator.now
+        )
+        for table in ('posts', 'follows'):
+            self.assertEqual(generator.rows(table, 0), again.rows(table, 0))
+        seed_dataset(generator)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedItem.objects.exists())
+        self.assertEqual(list(user_counter_drift()), [])
+        self.assertEqual(list(comment_counter_drift()), [])
+
+    def test_seed_command_is_reproducible(self):
+        """Два запуска seed на пустой базе дают одни и те же значения,
+        включая id и даты"""
+        options = {
+            'seed': 5,
+            'users': 15,
+            'groups': 2,
+            'posts': 40,
+            'comments': 60,
+            'follows': 3,
+            'workers': 1,
+        }
+
+        def dataset():
+            call_command('seed', stdout=StringIO(), **options)
+            return [
+                list(Post.objects.order_by('pk').values_list(
+                    'pk', 'text', 'pub_date', 'author_id', 'group_id'
+                )),
+                list(Comment.objects.order_by('pk').values_list(
+                    'pk', 'text', 'created', 'author_id', 'post_id', 'path'
+                )),
+                list(User.objects.order_by('pk').values_list(
+                    'pk', 'username', 'last_name', 'date_joined'
+                )),
+                list(Follow.objects.order_by('user_id', 'author_id')
+                     .values_list('user_id', 'author_id')),
+            ]
+
+        first = dataset()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(dataset(), first)
+
+    def test_follow_graph_is_skewed(self):
+        """У самых популярных авторов подписчиков много больше медианы"""
+        seed_dataset(DatasetGenerator(users=200, posts=10, comments=0))
+        counts = sorted(
+            User.objects.values_list('stats__followers_count', flat=True)
+        )
+        self.assertGreater(counts[-1], 10 * max(counts[len(counts) // 2], 1))
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+    def test_workers_do_not_change_dataset(self):
+        """Команда seed в нескольких процессах даёт те же строки, что и
+        генерация в одном; изображения записей лежат в хранилище"""
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, True)
+        options = {
+            'seed': 3,
+            'users': 20,
+            'groups': 2,
+            'posts': 120,
+            'comments': 30,
+            'follows': 3,
+            'images': 0.5,
+        }
+        expected = DatasetGenerator(
+            first_ids={'users': 1, 'groups': 1, 'posts': 1, 'comments': 1},
+            **options
+        )
+        call_command('seed', workers=2, stdout=StringIO(), **options)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'author_id', 'group_id', 'image'
+            )),
+            [row[:2] + row[3:6] for row in expected.rows('posts', 0)]
+        )
+        images = set(Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ))
+        self.assertTrue(images)
+        self.assertTrue(all(default_storage.exists(name) for name in images))
+
+
+class BenchmarkTests(TestCase):
+    def test_run_and_compare(self):
+        """Прогон смеси запросов без ошибок и сравнение с эталоном"""
+        seed_dataset(DatasetGenerator(users=20, posts=50, comments=50))
+        result = benchmark.run(requests=70, warmup=5)
+        self.assertEqual(result['requests'], 70)
+        self.assertEqual(result['errors'], {})
+        self.assertIn('index', result['views'])
+        self.assertEqual(benchmark.compare(result, result), [])
+        slower = {
+            **result,
+            'views': {
+                'index': {
+                    **result['views']['index'],
+                    'queries': result['views']['index']['queries'] + 3,
+                },
+            },
+        }
+        self.assertEqual(len(benchmark.compare(slower, result)), 1)
+
+
+class TemplateBenchmarkTests(TestCase):
+    def test_reports_cost_with_and_without_cache(self):
+        """Бенчмарк шаблонов выводит стоимость отрисовки для каждого;
+        карточки на страницах рисуются без кеша фрагментов"""
+        out = StringIO()
+        with mock.patch('posts.page_cache.cache') as card_cache:
+            call_command('template_benchmark', renders=2, stdout=out)
+        self.assertFalse(card_cache.mock_calls)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all('с кешем' in line for line in lines))
+        self.assertEqual(
+            [line.split(':')[0] for line in lines if 'фрагментов' in line],
+            ['index.html (карточки без кеша фрагментов)',
+             'profile.html (карточки без кеша фрагментов)']
+        )
+
+
+class DatabaseBenchmarkTests(TransactionTestCase):
+    # Без обёртки TestCase: копия базы снимается backup(), который
+    # ждёт окончания открытой транзакции записи.
+    def test_profiles_under_concurrent_writes(self):
+        """Бенчмарк профилей базы выполняет чтения и записи из
+        нескольких процессов; в production записи не падают на
+        блокировке"""
+        seed_dataset(DatasetGenerator(users=10, posts=30, comments=30))
+        results = {
+            name: db_benchmark.run_profile(
+                name,
+                workers=2,
+                seconds=0.5,
+                writes=0.5
+            )
+            for name in ('default', 'production')
+        }
+        for result in results.values():
+            self.assertGreater(result['reads'], 0)
+            self.assertGreater(result['writes'], 0)
+        self.assertEqual(results['production']['locked'], 0)
+        self.assertEqual(Comment.objects.count(), 30)
@@ -2,14 +2,19 @@ import shutil
 import tempfile
 
 from datetime import datetime
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, ImageFile
 
 from posts.forms import PostForm
-from posts.models import Group, Post, User
+from posts.models import Group, ImageVariant, Post, User
+from posts.thumbnails import generate_post_thumbnails, supported_formats
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
@@ -164,3 +169,158 @@ class PostFormTests(TestCase):
         )
         # Проверяем, что в БД не появилось лишних записей
         self.assertEqual(Post.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class PostThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.user = User.objects.create_user(username='Mr_Thumb')
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=small_gif,
+                content_type='image/gif'
+            ),
+        )
+        self.url = reverse(
+            'post',
+            kwargs={'username': self.user.username, 'post_id': self.post.id}
+        )
+
+    def test_page_does_not_resize_images(self):
+        """Страница не декодирует изображение, а показывает оригинал"""
+        with mock.patch('posts.thumbnails.Image.open') as image_open:
+            response = Client().get(self.url)
+        image_open.assert_not_called()
+        self.assertContains(response, self.post.image.url)
+
+    def test_pregenerated_variants_are_shown(self):
+        """После создания вариантов страница отдаёт их через srcset"""
+        generate_post_thumbnails(self.post)
+        variants = ImageVariant.objects.filter(post=self.post)
+        self.assertEqual(variants.count(), len(supported_formats()))
+        response = Client().get(self.url)
+        for variant in variants:
+            self.assertContains(response, f'{variant.file.url} 480w')
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_backfill_command(self):
+        """Команда создаёт варианты в нескольких процессах
+        и с --missing пропускает готовые"""
+        second = Post.objects.create(
+            text='Второй пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='second.gif',
+                content=self.post.image.read(),
+                content_type='image/gif'
+            ),
+        )
+        out = StringIO()
+        call_command('generate_thumbnails', workers=2, stdout=out)
+        self.assertIn('Обработано записей: 2', out.getvalue())
+        for post in (self.post, second):
+            self.assertTrue(post.image_variants.exists())
+        call_command('generate_thumbnails', missing=True, stdout=out)
+        self.assertIn('Обработано записей: 0', out.getvalue())
+
+    def test_upload_schedules_thumbnails(self):
+        """Загрузка через форму ставит создание миниатюр в очередь"""
+        client = Client()
+        client.force_login(self.user)
+        with mock.patch('posts.views.schedule_post_thumbnails') as schedule:
+            client.post(
+                reverse('new_post'),
+                data={
+                    'text': 'Ещё один пост',
+                    'image': SimpleUploadedFile(
+                        name='new.gif',
+                        content=self.post.image.read(),
+                        content_type='image/gif'
+                    ),
+                }
+            )
+        schedule.assert_called_once()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class PostImageLimitTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Mr_Limit')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def make_png(self, width, height):
+        buffer = BytesIO()
+        Image.effect_noise((width, height), 64).save(buffer, 'PNG')
+        return SimpleUploadedFile(
+            name='big.png',
+            content=buffer.getvalue(),
+            content_type='image/png'
+        )
+
+    def post_image(self, image):
+        return self.client.post(
+            reverse('new_post'),
+            data={'text': 'Пост с большой картинкой', 'image': image}
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_upload_over_byte_limit_is_rejected(self):
+        """Файл больше лимита не сохраняется, форма сообщает об ошибке"""
+        response = self.post_image(self.make_png(100, 100))
+        self.assertEqual(
+            response.context['form'].errors['image'][0],
+            'Файл слишком большой, можно загрузить не больше 1,0\xa0КБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=50 * 50)
+    def test_too_many_pixels_rejected_by_header(self):
+        """Размер в пикселях проверяется по заголовку без декодирования"""
+        with mock.patch.object(ImageFile.ImageFile, 'load') as load:
+            response = self.post_image(self.make_png(100, 60))
+        load.assert_not_called()
+        self.assertIn('100×60', response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_large_image_is_downscaled(self):
+        """Большое изображение уменьшается при приёме"""
+        self.post_image(self.make_png(200, 100))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (50, 25))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_converted_image_gets_jpeg_extension(self):
+        """Формат не из KEEP_FORMATS пересохраняется в JPEG с .jpg"""
+        buffer = BytesIO()
+        Image.effect_noise((200, 100), 64).convert('RGB').save(buffer, 'BMP')
+        self.post_image(SimpleUploadedFile(
+            name='big.bmp',
+            content=buffer.getvalue(),
+            content_type='image/bmp'
+        ))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual(Image.open(post.image.path).format, 'JPEG')
@@ -1,6 +1,14 @@
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import (
+    MAX_COMMENT_DEPTH, MAX_COMMENT_REPLIES, Comment, Follow, Group, Post,
+    User, UserStats,
+)
 
 
 class ModelPostTests(TestCase):
@@ -63,3 +71,127 @@ class ModelGroupTests(TestCase):
         group = ModelGroupTests.group
         expected_object_name = group.title
         self.assertEquals(expected_object_name, str(group))
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Mr_Author')
+        self.reader = User.objects.create_user(username='Mr_Reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики обновляются при создании и удалении записей,
+        комментариев и подписок"""
+        post = Post.objects.create(text='Текст', author=self.author)
+        comment = Comment.objects.create(
+            text='Комментарий',
+            author=self.reader,
+            post=post
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        author_stats = UserStats.objects.get(user=self.author)
+        reader_stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        author_stats.refresh_from_db()
+        reader_stats.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда rebuild_counters находит и исправляет расхождения"""
+        post = Post.objects.create(text='Текст', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comment_count=3)
+        out = StringIO()
+        call_command('rebuild_counters', '--dry-run', stdout=out)
+        self.assertIn('posts_count: 7 -> 1', out.getvalue())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count,
+            7
+        )
+
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count,
+            1
+        )
+        self.assertEqual(post.comment_count, 0)
+        out = StringIO()
+        call_command('rebuild_counters', '--dry-run', stdout=out)
+        self.assertIn('Расхождений нет.', out.getvalue())
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='thread_user')
+        cls.post = Post.objects.create(text='Запись', author=cls.user)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            text=text,
+            author=self.user,
+            post=self.post,
+            parent=parent
+        )
+
+    def test_threaded_order_and_subtree(self):
+        """Ветки идут целиком, новые выше старых; поддерево — диапазон
+        пути"""
+        old = self.comment('старая ветка')
+        new = self.comment('новая ветка')
+        reply = self.comment('ответ', old)
+        self.comment('ответ на ответ', reply)
+        self.comment('второй ответ', old)
+        self.assertEqual(
+            [
+                (comment.text, comment.depth)
+                for comment in self.post.comments.threaded()
+            ],
+            [
+                ('новая ветка', 0),
+                ('старая ветка', 0),
+                ('ответ', 1),
+                ('ответ на ответ', 2),
+                ('второй ответ', 1),
+            ]
+        )
+        self.assertEqual(
+            [comment.text for comment in Comment.objects.subtree(reply)],
+            ['ответ', 'ответ на ответ']
+        )
+        self.assertNotIn(new, Comment.objects.subtree(old))
+
+    def test_subtree_is_one_indexed_range(self):
+        """Поддерево читается по индексу (post, path)"""
+        root = self.comment('корень')
+        sql, params = Comment.objects.subtree(root).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('comment_post_path_idx', plan)
+
+    def test_depth_and_sibling_limits(self):
+        """Глубина ветки и число ответов на комментарий ограничены"""
+        parent = self.comment('корень')
+        for _ in range(MAX_COMMENT_DEPTH):
+            parent = self.comment('ответ', parent)
+        with self.assertRaises(ValidationError):
+            Comment(post=self.post, author=self.user, parent=parent).clean()
+        root = self.comment('популярный')
+        Comment.objects.bulk_create(
+            Comment(text='ответ', author=self.user, post=self.post,
+                    parent=root)
+            for _ in range(MAX_COMMENT_REPLIES)
+        )
+        with self.assertRaises(ValidationError):
+            Comment(post=self.post, author=self.user, parent=root).clean()
@@ -0,0 +1,130 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# «SCAN posts_post» без «USING INDEX» — полный просмотр таблицы,
+# «USE TEMP B-TREE FOR ORDER BY» (и «FOR RIGHT PART OF ORDER BY») —
+# сортировка всех подходящих строк, потому что индекс не даёт нужного
+# порядка.
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?\w+(?: AS \w+)?$')
+SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY$')
+
+
+def query_plans(queries):
+    """[(sql, [строки EXPLAIN QUERY PLAN])] для выполненных SELECT."""
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+    return plans
+
+
+def full_scans(plans):
+    return [
+        (sql, detail)
+        for sql, details in plans
+        for detail in details
+        if FULL_SCAN_RE.match(detail)
+        # Поиск упорядочен по bm25, его индексом не получить.
+        or SORT_RE.match(detail) and ' MATCH ' not in sql
+    ]
+
+
+class QueryPlanTest(TestCase):
+    """Запросы горячих страниц читают таблицы только по индексам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='plan_author')
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            description='Группа для планов запросов',
+            slug='plan-group'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(12):
+            post = Post.objects.create(
+                text=f'Запись номер {number}',
+                author=cls.author,
+                group=cls.group
+            )
+            Comment.objects.create(
+                text='Комментарий',
+                author=cls.reader,
+                post=post
+            )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def hot_urls(self):
+        return [
+            reverse('index'),
+            reverse('index') + '?page=2',
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse(
+                'post',
+                kwargs={
+                    'username': self.author.username,
+                    'post_id': self.post.pk
+                }
+            ),
+            reverse(
+                'post_comments',
+                kwargs={
+                    'username': self.author.username,
+                    'post_id': self.post.pk
+                }
+            ) + '?format=json',
+            reverse('follow_index'),
+            reverse('search') + '?q=запись',
+        ]
+
+    def test_hot_views_do_not_scan_tables(self):
+        """Ни один запрос горячих страниц не просматривает таблицу целиком"""
+        for url in self.hot_urls():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                scans = full_scans(query_plans(context.captured_queries))
+                self.assertEqual(
+                    scans,
+                    [],
+                    '\n'.join(f'{detail}: {sql}' for sql, detail in scans)
+                )
+
+    def test_harness_detects_full_scan(self):
+        """Проверка замечает запрос без подходящего индекса"""
+        plans = query_plans([
+            {'sql': 'SELECT "id" FROM "posts_post" WHERE "text" = \'x\''},
+        ])
+        self.assertEqual(len(full_scans(plans)), 1)
+
+    def test_harness_detects_sort(self):
+        """Проверка замечает сортировку, которой не даёт индекс"""
+        plans = query_plans([
+            {'sql': 'SELECT "id" FROM "posts_post" ORDER BY "text"'},
+            {
+                'sql': 'SELECT "id" FROM "posts_post" '
+                       'ORDER BY "pub_date" DESC, "text"'
+            },
+        ])
+        details = [detail for _, detail in full_scans(plans)]
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', details)
+        self.assertIn('USE TEMP B-TREE FOR RIGHT PART OF ORDER BY', details)
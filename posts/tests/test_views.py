@@ -5,10 +5,20 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts import cache_versions, page_cache
+from posts.models import (
+    MAX_COMMENT_DEPTH, Comment, FeedItem, Follow, Group, Post, User,
+)
+from posts.paginators import (
+    COMMENTS_PER_PAGE, CursorPaginator, elided_page_range, make_page
+)
 
 
 class PostPagesTests(TestCase):
@@ -55,6 +65,10 @@ class PostPagesTests(TestCase):
         shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
+    def setUp(self):
+        # Страницы кешируются целиком: каждый тест рисует их заново.
+        cache.clear()
+
     def test_posts_pages_uses_correct_template(self):
         """URL-адрес app posts использует соответствующий шаблон."""
         templates_pages_names = {
@@ -225,6 +239,9 @@ class PaginatorViewsTest(TestCase):
                 group=PaginatorViewsTest.test_group
             )
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_containse_ten_records(self):
         """Количество постов на первой странице index и group/test-group
          равно 10"""
@@ -278,6 +295,138 @@ class PaginatorViewsTest(TestCase):
                     )
                     pub_date_later_post = pub_date_early_post
 
+    def test_cursor_navigation(self):
+        """Курсорные ссылки ведут на следующую и предыдущую страницы"""
+        url = reverse('group', kwargs={'slug': 'test-group'})
+        first_page = self.authorized_client.get(url).context['page']
+        second_page = self.authorized_client.get(
+            url,
+            {'page': 2, 'after': first_page.next_cursor}
+        ).context['page']
+        self.assertEqual(len(second_page.object_list), 3)
+        self.assertEqual(second_page.number, 2)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+        back_page = self.authorized_client.get(
+            url,
+            {'page': 1, 'before': second_page.previous_cursor}
+        ).context['page']
+        self.assertEqual(
+            list(back_page.object_list),
+            list(first_page.object_list)
+        )
+
+    def test_profile_pages_are_numbered(self):
+        """У профиля число записей известно из счётчика: есть номера
+        страниц, а у главной — только курсорные ссылки"""
+        profile = self.authorized_client.get(
+            reverse('profile', kwargs={'username': self.test_user.username})
+        )
+        self.assertEqual(profile.context['page'].page_links, [1, 2])
+        self.assertEqual(profile.context['page'].paginator.num_pages, 2)
+        self.assertContains(profile, 'href="?page=2"')
+        index = self.authorized_client.get(reverse('index'))
+        self.assertEqual(index.context['page'].page_links, [])
+        self.assertNotContains(index, 'href="?page=2"')
+
+    def test_huge_page_count_is_elided(self):
+        """При ста тысячах страниц в навигации только первая, последняя
+        и соседние с текущей"""
+        page = make_page([], 10, 2, True, 10, count=1000000)
+        page.next_cursor = 'cursor'
+        self.assertEqual(page.paginator.num_pages, 100000)
+        self.assertEqual(page.page_links, [1, 2, 3, 4, None, 100000])
+        html = render_to_string('paginator.html', {'page': page})
+        self.assertEqual(html.count('class="page-item'), 8)
+        self.assertIn('?page=100000"', html)
+
+    def test_elided_page_range(self):
+        """Номера страниц с пропусками вокруг текущей"""
+        cases = {
+            (1, 7): [1, 2, 3, 4, 5, 6, 7],
+            (1, 50): [1, 2, 3, None, 50],
+            (25, 50): [1, None, 23, 24, 25, 26, 27, None, 50],
+            (49, 50): [1, None, 47, 48, 49, 50],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    elided_page_range(number, num_pages),
+                    expected
+                )
+
+    def test_paginator_does_not_count(self):
+        """Паджинатор не выполняет COUNT(*) по всей ленте"""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(
+                reverse('group', kwargs={'slug': 'test-group'})
+            )
+        self.assertFalse(
+            [q for q in queries if '__count' in q['sql']]
+        )
+
+    def test_page_is_one_query(self):
+        """Наличие следующей страницы определяется той же выборкой:
+        одна лишняя строка, а не отдельный запрос"""
+        total = Post.objects.count()
+        for per_page, has_next in ((total - 1, True), (total, False)):
+            with self.subTest(per_page=per_page):
+                with self.assertNumQueries(1):
+                    page = CursorPaginator(
+                        Post.objects.all(),
+                        per_page=per_page
+                    ).get_page({})
+                    self.assertEqual(len(page.object_list), per_page)
+                    self.assertEqual(
+                        len(list(page.object_list)),
+                        per_page
+                    )
+                self.assertIsInstance(page.object_list, QuerySet)
+                self.assertEqual(page.has_next(), has_next)
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.group = Group.objects.create(
+            title='Группа',
+            description='Группа для подсчёта запросов',
+            slug='budget-group'
+        )
+        authors = [
+            User.objects.create_user(username=f'author_{num}')
+            for num in range(5)
+        ]
+        for num in range(12):
+            post = Post.objects.create(
+                text=f'Текст поста № {num}',
+                author=authors[num % len(authors)],
+                group=cls.group
+            )
+            Comment.objects.create(
+                text='Комментарий',
+                author=authors[0],
+                post=post
+            )
+
+    def test_list_pages_query_budget(self):
+        """Число запросов страницы со списком постов не зависит
+        от количества постов на ней"""
+        cache.clear()
+        pages = {
+            reverse('index'): 2,
+            reverse('group', kwargs={'slug': self.group.slug}): 3,
+        }
+        for url, budget in pages.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    response = self.guest_client.get(url)
+                self.assertContains(response, 'Комментариев: 1')
+
 
 class CashTest(TestCase):
     @classmethod
@@ -294,19 +443,21 @@ class CashTest(TestCase):
 
     def test_index_page_cash(self):
         """Посты страницы Index хранятся в cash и обновляются
-            каждые 20 сек"""
+            сразу после записи"""
         response_start = CashTest.guest_client.get(
             reverse('index') + '?page=2'
         )
-        Post.objects.create(
-            text='Новый пост',
-            author=CashTest.test_user
+        Post.objects.filter(author=CashTest.test_user).update(
+            text='Изменено в обход сигналов'
         )
         response_cashe = CashTest.guest_client.get(
             reverse('index') + '?page=2'
         )
-        cache.clear()
-        response_timeout = CashTest.guest_client.get(
+        Post.objects.create(
+            text='Новый пост',
+            author=CashTest.test_user
+        )
+        response_new_post = CashTest.guest_client.get(
             reverse('index') + '?page=2'
         )
         self.assertEqual(
@@ -315,8 +466,39 @@ class CashTest(TestCase):
             'Контент не был закеширован!')
         self.assertNotEqual(
             response_start.content,
-            response_timeout.content,
-            'При отчистке кеша контент не изменился!')
+            response_new_post.content,
+            'После создания поста контент не изменился!')
+
+    def test_comment_and_follow_invalidate_pages(self):
+        """Комментарий и подписка сразу обновляют страницы поста
+        и профиля"""
+        author = User.objects.create_user(username='Mr_Cached')
+        reader = User.objects.create_user(username='Mr_Reader')
+        post = Post.objects.create(text='Запись автора', author=author)
+        post_url = reverse(
+            'post',
+            kwargs={'username': author.username, 'post_id': post.id}
+        )
+        profile_url = reverse(
+            'profile',
+            kwargs={'username': author.username}
+        )
+        CashTest.guest_client.get(post_url)
+        CashTest.guest_client.get(profile_url)
+        Comment.objects.create(
+            text='Свежий комментарий',
+            author=reader,
+            post=post
+        )
+        Follow.objects.create(user=reader, author=author)
+        self.assertContains(
+            CashTest.guest_client.get(post_url),
+            'Свежий комментарий'
+        )
+        self.assertContains(
+            CashTest.guest_client.get(profile_url),
+            'Подписчиков: 1'
+        )
 
 
 class FollowTest(TestCase):
@@ -382,6 +564,96 @@ class FollowTest(TestCase):
             'В ленте неподписанного пользователя есть записи автора'
         )
 
+    def test_new_post_fanned_out_to_followers(self):
+        """Новая запись автора попадает в ленту подписчика при сохранении"""
+        new_post = Post.objects.create(
+            text='Новая запись автора',
+            author=self.user_author
+        )
+        self.assertTrue(
+            FeedItem.objects.filter(
+                user=self.user_follower,
+                post=new_post
+            ).exists()
+        )
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.user_ignor).exists()
+        )
+        response = self.authorized_follower.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0], new_post)
+
+    def test_feed_pages_follow_inbox_cursor(self):
+        """Лента листается курсором по строкам FeedItem, записи
+        страницы загружаются по id"""
+        posts = [self.authors_post] + [
+            Post.objects.create(
+                text=f'Запись {number}',
+                author=self.user_author
+            )
+            for number in range(11)
+        ]
+        first = self.authorized_follower.get(
+            reverse('follow_index')
+        ).context['page']
+        self.assertEqual(list(first), posts[:1:-1])
+        second = self.authorized_follower.get(
+            reverse('follow_index'),
+            {'page': 2, 'after': first.next_cursor}
+        ).context['page']
+        self.assertEqual(list(second), posts[1::-1])
+        self.assertFalse(second.has_next())
+
+    def test_unfollow_cleans_feed(self):
+        """После отписки записи автора удаляются из ленты"""
+        self.follow.delete()
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.user_follower).exists()
+        )
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_hybrid_feed_merges_popular_authors(self):
+        """Записи популярных авторов не рассылаются, а подмешиваются
+        в ленту при чтении"""
+        new_post = Post.objects.create(
+            text='Запись популярного автора',
+            author=self.user_author
+        )
+        self.assertFalse(FeedItem.objects.filter(post=new_post).exists())
+        response = self.authorized_follower.get(reverse('follow_index'))
+        self.assertIn(new_post, response.context['page'])
+        self.assertIn(self.authors_post, response.context['page'])
+        response = self.authorized_ignor.get(reverse('follow_index'))
+        self.assertNotIn(new_post, response.context['page'])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_back_under_fanout_limit_is_backfilled(self):
+        """Записи, опубликованные, пока автор не рассылался, попадают
+        в ленты, когда подписчиков снова не больше лимита"""
+        extra = Follow.objects.create(
+            user=self.user_ignor,
+            author=self.user_author
+        )
+        new_post = Post.objects.create(
+            text='Запись популярного автора',
+            author=self.user_author
+        )
+        self.assertFalse(FeedItem.objects.filter(post=new_post).exists())
+        response = self.authorized_follower.get(reverse('follow_index'))
+        self.assertIn(new_post, response.context['page'])
+        extra.delete()
+        self.assertTrue(
+            FeedItem.objects.filter(
+                user=self.user_follower,
+                post=new_post
+            ).exists()
+        )
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.user_ignor).exists()
+        )
+        response = self.authorized_follower.get(reverse('follow_index'))
+        self.assertIn(new_post, response.context['page'])
+        self.assertIn(self.authors_post, response.context['page'])
+
 
 class CommentTest(TestCase):
     def setUp(self):
@@ -452,3 +724,546 @@ class CommentTest(TestCase):
             'Неавторизованный пользователь не должен '
             'иметь возможности добавлять коментарии'
         )
+
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.author = User.objects.create_user(
+            username='leo_tolstoy',
+            first_name='Лев'
+        )
+        self.group = Group.objects.create(
+            title='Классики',
+            description='Русская литература',
+            slug='classics'
+        )
+        self.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга <b>',
+            author=self.author,
+            group=self.group
+        )
+
+    def search(self, query, **params):
+        return self.client.get(reverse('search'), {'q': query, **params})
+
+    def found(self, query):
+        return [post.pk for post in self.search(query).context['page']]
+
+    def test_search_by_text_group_and_author(self):
+        """Поиск находит запись по тексту, группе и имени автора"""
+        for query in ('счастлив', 'классики', 'Лев', 'leo'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.post.pk])
+        self.assertEqual(self.found('несчастная'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечены, а HTML из текста экранирован"""
+        response = self.search('семьи')
+        self.assertContains(response, '<mark>семьи</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке записи, группы и удалении"""
+        self.post.text = 'Каждая несчастливая семья несчастлива по-своему'
+        self.post.save()
+        self.assertEqual(self.found('похожи'), [])
+        self.assertEqual(self.found('несчастлива'), [self.post.pk])
+        self.group.title = 'Романы'
+        self.group.save()
+        self.assertEqual(self.found('романы'), [self.post.pk])
+        self.group.delete()
+        self.assertEqual(self.found('романы'), [])
+        self.post.delete()
+        self.assertEqual(self.found('несчастлива'), [])
+
+    def test_cursor_pagination(self):
+        """Результаты листаются курсором вперёд и назад"""
+        for number in range(14):
+            Post.objects.create(
+                text=f'Роман номер {number}',
+                author=self.author
+            )
+        first = self.search('роман').context['page']
+        self.assertEqual(len(first), 10)
+        self.assertTrue(first.has_next())
+        second = self.search(
+            'роман',
+            page=2,
+            after=first.next_cursor
+        ).context['page']
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second))
+        back = self.search(
+            'роман',
+            page=1,
+            before=second.previous_cursor
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+
+    def test_fts_syntax_is_not_interpreted(self):
+        """Операторы FTS5 в запросе не приводят к ошибке"""
+        for query in ('семьи OR', '"', 'text:*', 'NEAR(a b)'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(username='validator')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа',
+            description='Группа для условных запросов',
+            slug='conditional'
+        )
+        self.post = Post.objects.create(
+            text='Запись',
+            author=self.author,
+            group=self.group
+        )
+
+    def urls(self):
+        return [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse(
+                'post',
+                kwargs={
+                    'username': self.author.username,
+                    'post_id': self.post.pk
+                }
+            ),
+        ]
+
+    def test_unchanged_pages_answer_304(self):
+        """Страница без изменений отдаёт 304 по ETag и по
+        Last-Modified, не выбирая записи из базы"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with CaptureQueriesContext(connection) as context:
+                    by_etag = self.client.get(
+                        url,
+                        HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(by_etag.status_code, 304)
+                self.assertEqual(by_etag['ETag'], response['ETag'])
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'posts_post' in query['sql']
+                    and 'posts_post"."id" = ' not in query['sql']
+                ])
+                by_date = self.client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(by_date.status_code, 304)
+
+    def test_last_modified_only_for_shared_page(self):
+        """Last-Modified не различает пользователей: после входа
+        If-Modified-Since от страницы анонима не даёт 304, а страница
+        пользователя и страница с CSRF-cookie его не получают"""
+        url = reverse('index')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.client.logout()
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_changes_and_user_change_etag(self):
+        """Комментарий, подписка и другой пользователь дают новый ETag"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Comment.objects.create(
+            text='Комментарий',
+            author=self.reader,
+            post=self.post
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                    200
+                )
+        self.client.force_login(self.reader)
+        url = reverse('index')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, Client().get(url)['ETag'])
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304
+        )
+
+    def test_follow_index_tracks_subscriptions(self):
+        """Лента подписок меняет ETag после новой подписки читателя"""
+        self.client.force_login(self.reader)
+        url = reverse('follow_index')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Запись')
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='page_author')
+        self.reader = User.objects.create_user(username='page_reader')
+        self.post = Post.objects.create(
+            text='Запись <!--hole nav-->',
+            author=self.author
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_page_is_shared_and_filled_per_user(self):
+        """Страница рисуется один раз, а кнопки и меню — для каждого
+        пользователя свои"""
+        url = reverse('index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            anonymous = self.client.get(url)
+        self.assertContains(anonymous, 'Войти')
+        self.assertNotContains(anonymous, 'Редактировать')
+        with CaptureQueriesContext(connection) as context:
+            own = self.author_client.get(url)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'posts_post' in query['sql']
+        ])
+        self.assertContains(own, 'Пользователь: page_author')
+        self.assertContains(own, 'Редактировать')
+        self.assertContains(own, 'Избранные авторы')
+        other = self.reader_client.get(url)
+        self.assertContains(other, 'Пользователь: page_reader')
+        self.assertNotContains(other, 'Редактировать')
+
+    def test_markers_in_text_are_not_filled(self):
+        """Метка в тексте записи экранирована и не заполняется"""
+        response = self.author_client.get(reverse('index'))
+        self.assertContains(response, '&lt;!--hole nav--&gt;')
+        self.assertContains(response, 'Пользователь: page_author', 1)
+
+    def test_follow_button_and_comment_form(self):
+        """Кнопка подписки и форма комментария зависят от пользователя"""
+        profile_url = reverse(
+            'profile',
+            kwargs={'username': self.author.username}
+        )
+        post_url = reverse(
+            'post',
+            kwargs={
+                'username': self.author.username,
+                'post_id': self.post.pk
+            }
+        )
+        for client, expected in ((self.reader_client, 1),
+                                 (self.author_client, 0),
+                                 (self.client, 0)):
+            self.assertContains(
+                client.get(profile_url),
+                'Подписаться',
+                expected
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(
+            self.reader_client.get(profile_url),
+            'Отписаться'
+        )
+        self.assertNotContains(
+            self.client.get(post_url),
+            'csrfmiddlewaretoken'
+        )
+        self.assertContains(
+            self.reader_client.get(post_url),
+            'csrfmiddlewaretoken'
+        )
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='card_author')
+        self.reader = User.objects.create_user(username='card_reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(title='Старое имя', slug='cards')
+        self.post = Post.objects.create(
+            text='Текст карточки',
+            author=self.author,
+            group=self.group
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def card_renders(self, response):
+        return [
+            template.name for template in response.templates
+        ].count('includes/post_item.html')
+
+    def test_card_is_rendered_once_for_all_lists(self):
+        """Карточка, нарисованная для главной, берётся из кеша
+        на странице группы и в ленте"""
+        self.assertEqual(
+            self.card_renders(self.reader_client.get(reverse('index'))),
+            1
+        )
+        group = self.reader_client.get(
+            reverse('group', kwargs={'slug': self.group.slug})
+        )
+        follow = self.reader_client.get(reverse('follow_index'))
+        self.assertEqual(self.card_renders(group), 0)
+        self.assertEqual(self.card_renders(follow), 0)
+        self.assertContains(follow, 'Текст карточки')
+
+    def test_card_follows_changes(self):
+        """Правка записи и переименование группы видны в карточке"""
+        self.reader_client.get(reverse('follow_index'))
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.group.title = 'Новое имя'
+        self.group.save()
+        response = self.reader_client.get(reverse('follow_index'))
+        self.assertContains(response, 'Новый текст')
+        self.assertContains(response, 'Новое имя')
+        self.assertNotContains(response, 'Старое имя')
+
+    def test_cached_pages_follow_renames(self):
+        """Переименование группы и автора видно на страницах, уже
+        лежащих в кеше целиком"""
+        pages = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+        ]
+        for url in pages:
+            self.assertContains(self.client.get(url), 'Старое имя')
+        self.group.title = 'Новое имя'
+        self.group.save()
+        self.author.username = 'renamed_author'
+        self.author.save()
+        for url in pages[:2]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Новое имя')
+                self.assertContains(response, 'renamed_author')
+        response = self.client.get(pages[2])
+        self.assertEqual(response.status_code, 404)
+
+    def test_last_login_keeps_cached_pages(self):
+        """Сохранение пользователя без смены имени не сбрасывает кеш"""
+        self.client.get(reverse('index'))
+        version = cache_versions.get_version(cache_versions.index_scope())
+        self.author.save(update_fields=['last_login'])
+        self.author.save()
+        self.assertEqual(
+            cache_versions.get_version(cache_versions.index_scope()),
+            version
+        )
+
+    def test_local_cache_keeps_pages_briefly(self):
+        """С отдельным кешем у каждого процесса страницы и карточки
+        хранятся недолго, с общим — PAGE_CACHE_TIMEOUT"""
+        self.assertEqual(
+            page_cache._timeout(),
+            settings.LOCAL_PAGE_CACHE_TIMEOUT
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        shared = {
+            'BACKEND': 'yatube.cache.SQLiteCache',
+            'LOCATION': f'{directory}/cache.sqlite3',
+        }
+        with override_settings(CACHES={'default': shared}):
+            self.assertEqual(
+                page_cache._timeout(),
+                settings.PAGE_CACHE_TIMEOUT
+            )
+
+    def test_edit_link_only_for_author(self):
+        """Общая карточка показывает «Редактировать» только автору"""
+        url = reverse('profile', kwargs={'username': self.author.username})
+        self.assertNotContains(self.reader_client.get(url), 'Редактировать')
+        self.assertContains(self.author_client.get(url), 'Редактировать')
+        self.assertNotContains(self.client.get(url), 'Редактировать')
+
+
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='comments_author')
+        cls.post = Post.objects.create(text='Запись', author=cls.author)
+        for number in range(45):
+            Comment.objects.create(
+                text=f'Комментарий №{number}',
+                author=User.objects.create_user(username=f'reader_{number}'),
+                post=cls.post
+            )
+        kwargs = {'username': cls.author.username, 'post_id': cls.post.pk}
+        cls.post_url = reverse('post', kwargs=kwargs)
+        cls.more_url = reverse('post_comments', kwargs=kwargs)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_chunk(self):
+        """На странице записи только первая порция комментариев,
+        а число запросов не зависит от числа комментариев"""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий №44')
+        self.assertContains(response, '@reader_', COMMENTS_PER_PAGE)
+        self.assertContains(
+            response,
+            self.more_url + '?after='
+            + response.context['comments_page'].next_cursor
+        )
+
+    def test_load_more_html(self):
+        """«Показать ещё» отдаёт следующую порцию HTML-фрагментом"""
+        first = self.client.get(self.post_url).context['comments_page']
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.more_url,
+                {'after': first.next_cursor}
+            )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'Комментарий №24')
+        self.assertNotContains(response, 'Комментарий №25<')
+        self.assertContains(response, 'js-more-comments')
+
+    def test_load_more_json(self):
+        """С format=json порции идут в JSON, пока не кончатся"""
+        url = self.more_url + '?format=json'
+        texts = []
+        while url:
+            data = self.client.get(url).json()
+            texts += [comment['text'] for comment in data['comments']]
+            url = data['next']
+        self.assertEqual(
+            texts,
+            [f'Комментарий №{number}' for number in range(44, -1, -1)]
+        )
+        self.assertEqual(data['comments'][-1]['author'], 'reader_0')
+
+
+class CommentRepliesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='reply_author')
+        self.post = Post.objects.create(text='Запись', author=self.author)
+        self.root = Comment.objects.create(
+            text='Корень',
+            author=self.author,
+            post=self.post
+        )
+        kwargs = {'username': self.author.username, 'post_id': self.post.pk}
+        self.post_url = reverse('post', kwargs=kwargs)
+        self.comment_url = reverse('add_comment', kwargs=kwargs)
+        self.more_url = reverse('post_comments', kwargs=kwargs)
+        self.client.force_login(self.author)
+
+    def test_reply_is_shown_under_parent(self):
+        """Ответ сохраняется в ветке и выводится под родителем"""
+        self.client.post(
+            self.comment_url,
+            {'text': 'Ответ', 'parent': self.root.pk}
+        )
+        Comment.objects.create(
+            text='Новая ветка',
+            author=self.author,
+            post=self.post
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, self.root)
+        self.assertEqual(reply.depth, 1)
+        response = self.client.get(self.post_url)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Новая ветка', 'Корень', 'Ответ']
+        )
+        self.assertContains(response, 'margin-left: 2rem')
+
+    def test_reply_link_fills_form_from_cached_page(self):
+        """Ссылка «Ответить» добавляет родителя в форму и на странице
+        из кеша"""
+        self.client.get(self.post_url)
+        response = self.client.get(self.post_url, {'reply_to': self.root.pk})
+        self.assertContains(
+            response,
+            f'name="parent" value="{self.root.pk}"'
+        )
+
+    def test_reply_limits(self):
+        """Ответ на чужую запись — 404, слишком глубокий — ошибка формы"""
+        other_post = Post.objects.create(text='Другая', author=self.author)
+        foreign = Comment.objects.create(
+            text='Чужой',
+            author=self.author,
+            post=other_post
+        )
+        response = self.client.post(
+            self.comment_url,
+            {'text': 'Ответ', 'parent': foreign.pk}
+        )
+        self.assertEqual(response.status_code, 404)
+        parent = self.root
+        for _ in range(MAX_COMMENT_DEPTH):
+            parent = Comment.objects.create(
+                text='Ответ',
+                author=self.author,
+                post=self.post,
+                parent=parent
+            )
+        response = self.client.post(
+            self.comment_url,
+            {'text': 'Слишком глубоко', 'parent': parent.pk}
+        )
+        self.assertContains(response, 'В этой ветке больше нельзя отвечать')
+        self.assertFalse(
+            Comment.objects.filter(text='Слишком глубоко').exists()
+        )
+
+    def test_thread_endpoint_returns_subtree(self):
+        """?thread=id отдаёт только ветку комментария"""
+        reply = Comment.objects.create(
+            text='Ответ',
+            author=self.author,
+            post=self.post,
+            parent=self.root
+        )
+        Comment.objects.create(
+            text='Другая ветка',
+            author=self.author,
+            post=self.post
+        )
+        data = self.client.get(
+            self.more_url,
+            {'thread': self.root.pk, 'format': 'json'}
+        ).json()
+        self.assertEqual(
+            [(item['text'], item['parent']) for item in data['comments']],
+            [('Корень', None), ('Ответ', self.root.pk)]
+        )
+        self.assertEqual(data['comments'][1]['id'], reply.pk)
@@ -0,0 +1,158 @@
+"""Адаптивные варианты изображений записей.
+
+Из каждого изображения вырезается кадр в пропорциях карточки
+(CARD_SIZE) и сохраняется в нескольких ширинах и форматах: JPEG для
+всех браузеров, WebP и AVIF, если установленный Pillow умеет его
+записывать. Шаблон отдаёт варианты через <picture> и srcset, и браузер
+сам выбирает файл под ширину экрана. Варианты создаются фоновой
+задачей при загрузке; пока их нет, показывается оригинал. Во время
+запроса изображения не декодируются.
+"""
+import posixpath
+from collections import defaultdict
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from jobs.queue import enqueue
+
+from . import cache_versions
+from .models import ImageVariant, Post
+
+CARD_SIZE = (960, 339)
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_DIRECTORY = 'posts/variants'
+# Формат Pillow: (MIME-тип, расширение, параметры сохранения).
+# Порядок задаёт порядок <source>: браузер берёт первый подходящий.
+VARIANT_FORMATS = {
+    'AVIF': ('image/avif', 'avif', {'quality': 50}),
+    'WEBP': ('image/webp', 'webp', {'quality': 75, 'method': 6}),
+    'JPEG': (
+        'image/jpeg',
+        'jpg',
+        {'quality': 82, 'optimize': True, 'progressive': True},
+    ),
+}
+FALLBACK_FORMAT = 'JPEG'
+IMAGE_SIZES = f'(max-width: {CARD_SIZE[0]}px) 100vw, {CARD_SIZE[0]}px'
+
+
+def supported_formats():
+    Image.init()
+    return [name for name in VARIANT_FORMATS if name in Image.SAVE]
+
+
+def variant_widths(width, height):
+    """Ширины не больше кадра, который можно вырезать из оригинала;
+    маленькое изображение растягивается до самой узкой ширины."""
+    frame_width = min(width, height * CARD_SIZE[0] // CARD_SIZE[1])
+    widths = [size for size in VARIANT_WIDTHS if size <= frame_width]
+    return widths or [VARIANT_WIDTHS[0]]
+
+
+def variant_name(image_name, width, extension):
+    stem = posixpath.splitext(posixpath.basename(image_name))[0]
+    return f'{VARIANT_DIRECTORY}/{stem}/{width}.{extension}'
+
+
+def render_variants(image_name):
+    """Сохраняет файлы вариантов и возвращает их описания
+    (формат, ширина, высота, имя файла).
+
+    Функция не обращается к базе, поэтому generate_thumbnails
+    запускает её в нескольких процессах.
+    """
+    with default_storage.open(image_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    variants = []
+    for width in variant_widths(*image.size):
+        height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+        frame = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for image_format in supported_formats():
+            _, extension, params = VARIANT_FORMATS[image_format]
+            buffer = BytesIO()
+            frame.save(buffer, image_format, **params)
+            name = variant_name(image_name, width, extension)
+            default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append((image_format, width, height, name))
+    return variants
+
+
+def _invalidate_post(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'pk',
+        'author_id',
+        'group_id'
+    ).first()
+    if post is not None:
+        cache_versions.invalidate(*cache_versions.post_scopes(*post))
+
+
+@transaction.atomic
+def save_variants(post_id, variants):
+    ImageVariant.objects.filter(post_id=post_id).delete()
+    ImageVariant.objects.bulk_create([
+        ImageVariant(
+            post_id=post_id,
+            format=image_format,
+            width=width,
+            height=height,
+            file=name
+        )
+        for image_format, width, height, name in variants
+    ])
+    _invalidate_post(post_id)
+
+
+def drop_variants(post):
+    """Удаляет варианты прежнего изображения вместе с файлами."""
+    for variant in post.image_variants.all():
+        variant.file.delete(save=False)
+    post.image_variants.all().delete()
+
+
+def generate_post_thumbnails(post):
+    if not post.image:
+        return
+    save_variants(post.pk, render_variants(post.image.name))
+
+
+def schedule_post_thumbnails(post):
+    enqueue('posts.generate_thumbnails', post.pk)
+
+
+def picture_sources(post):
+    """Данные для <picture>: <source> по форматам и запасной <img>.
+
+    Читает только post.image_variants, которые for_cards() загружает
+    заранее.
+    """
+    srcsets = defaultdict(list)
+    fallback = None
+    for variant in post.image_variants.all():
+        srcsets[variant.format].append(f'{variant.file.url} {variant.width}w')
+        if variant.format == FALLBACK_FORMAT and (
+            fallback is None or variant.width <= CARD_SIZE[0]
+        ):
+            fallback = variant
+    if fallback is None:
+        return {'src': post.image.url, 'sources': []}
+    return {
+        'src': fallback.file.url,
+        'width': fallback.width,
+        'height': fallback.height,
+        'srcset': ', '.join(srcsets[FALLBACK_FORMAT]),
+        'sizes': IMAGE_SIZES,
+        'sources': [
+            (mime_type, ', '.join(srcsets[image_format]))
+            for image_format, (mime_type, _, _) in VARIANT_FORMATS.items()
+            if image_format != FALLBACK_FORMAT and image_format in srcsets
+        ],
+    }
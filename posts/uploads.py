@@ -0,0 +1,122 @@
+"""Ограничения на загружаемые изображения.
+
+LimitedUploadHandler стоит первым в FILE_UPLOAD_HANDLERS и считает
+байты каждого файла по мере чтения запроса. Файл больше
+POST_IMAGE_MAX_BYTES дальше не сохраняется: остаток тела запроса
+читается и отбрасывается, а форма получает пустую заглушку
+и показывает ошибку.
+
+limit_image() по размеру из заголовка отклоняет картинки больше
+POST_IMAGE_MAX_PIXELS пикселей ещё до декодирования. Изображение,
+у которого сторона больше POST_IMAGE_MAX_SIDE, уменьшается при приёме,
+так что дальше по конвейеру (варианты в posts.thumbnails) идут файлы
+ограниченного размера.
+"""
+import os
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, в которых уменьшенное изображение сохраняется как было;
+# остальные пересохраняются в JPEG.
+KEEP_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class OversizedUpload(SimpleUploadedFile):
+    """Заглушка вместо файла, загрузка которого прервана из-за размера."""
+
+    def __init__(self, name, content_type, size):
+        super().__init__(name, b'', content_type)
+        self.size = size
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.oversized:
+            return None
+        self.received += len(raw_data)
+        if self.received > _setting('POST_IMAGE_MAX_BYTES', 10 * 2 ** 20):
+            # Следующие обработчики больше не получают данные,
+            # уже записанное ими выбрасывается вместе с ними.
+            self.oversized = True
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.oversized:
+            return OversizedUpload(
+                self.file_name,
+                self.content_type,
+                self.received
+            )
+        return None
+
+
+def downscale(uploaded, image_format, max_side):
+    """Уменьшает изображение так, чтобы большая сторона была не больше
+    max_side. JPEG декодируется сразу в уменьшенном масштабе (draft).
+    Формат не из KEEP_FORMATS пересохраняется в JPEG с расширением
+    .jpg."""
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    name = uploaded.name
+    if image_format not in KEEP_FORMATS:
+        image_format = 'JPEG'
+        name = os.path.splitext(name)[0] + '.jpg'
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    params = {'quality': 90} if image_format in ('JPEG', 'WEBP') else {}
+    image.save(buffer, image_format, **params)
+    return SimpleUploadedFile(
+        name,
+        buffer.getvalue(),
+        Image.MIME.get(image_format)
+    )
+
+
+def too_large_error():
+    return forms.ValidationError(
+        'Файл слишком большой, можно загрузить не больше %(limit)s.',
+        code='too_large',
+        params={'limit': filesizeformat(
+            _setting('POST_IMAGE_MAX_BYTES', 10 * 2 ** 20)
+        )},
+    )
+
+
+def limit_image(uploaded):
+    """Проверяет размер в пикселях и при необходимости уменьшает
+    изображение, уже принятое forms.ImageField.
+
+    ImageField только открывает файл и вызывает verify(), поэтому
+    uploaded.image.size взят из заголовка и пиксели ещё не декодированы.
+    """
+    width, height = uploaded.image.size
+    if width * height > _setting('POST_IMAGE_MAX_PIXELS', 40_000_000):
+        raise forms.ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s пикселей.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    max_side = _setting('POST_IMAGE_MAX_SIDE', 2560)
+    if max(width, height) > max_side:
+        return downscale(uploaded, uploaded.image.format, max_side)
+    return uploaded
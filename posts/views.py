@@ -1,37 +1,87 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render, reverse
 
+from yatube.replicas import replica_reads
+
+from . import cache_versions, search as post_search
+from .conditional import PageValidators
+from .counters import get_stats
+from .feed import feed_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .page_cache import cached_page
+from .paginators import COMMENTS_PER_PAGE, CursorPaginator
+from .thumbnails import drop_variants, schedule_post_thumbnails
 
 
+@replica_reads
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-        request,
-        'index.html',
-        {'page_number': page_number, 'page': page}
+    validators = PageValidators(request, cache_versions.index_scope())
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+
+    def render_page():
+        post_list = Post.objects.for_cards()
+        page = CursorPaginator(post_list).get_page(request.GET)
+        return render(
+            request,
+            'index.html',
+            {
+                'page_number': page.number,
+                'page': page,
+                'cache_version': validators.version,
+                'page_holes': True,
+            }
+        )
+
+    return validators.apply(
+        cached_page(request, validators.version, render_page)
     )
 
 
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    validators = PageValidators(
         request,
-        'group.html',
-        {'group': group, 'page': page}
+        cache_versions.group_scope(group.pk)
     )
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+
+    def render_page():
+        post_list = group.posts.for_cards()
+        page = CursorPaginator(post_list).get_page(request.GET)
+        return render(
+            request,
+            'group.html',
+            {
+                'group': group,
+                'page': page,
+                'cache_version': validators.version,
+                'page_holes': True,
+            }
+        )
+
+    return validators.apply(
+        cached_page(request, validators.version, render_page)
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = post_search.search_page(query, request.GET) if query else None
+    return render(request, 'search.html', {'query': query, 'page': page})
 
 
 @login_required
+@transaction.atomic
 def new_post(request):
     view_def = 'new_post'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -44,55 +94,176 @@ def new_post(request):
     new_post = form.save(commit=False)
     new_post.author = request.user
     new_post.save()
+    if new_post.image:
+        schedule_post_thumbnails(new_post)
     return redirect('index')
 
 
+def post_page_scopes(post):
+    return (
+        cache_versions.post_scope(post.pk),
+        cache_versions.profile_scope(post.author_id),
+    )
+
+
+def comment_page(post, params, thread=None):
+    """Порция комментариев к post (или только ветки thread) в порядке
+    веток, вместе с авторами: первая или следующая за курсором
+    params['after']."""
+    if thread is None:
+        comments = post.comments.threaded()
+    else:
+        comments = Comment.objects.subtree(thread)
+    return CursorPaginator(
+        comments,
+        per_page=COMMENTS_PER_PAGE,
+        keys=('path',),
+        descending=False
+    ).get_page(params)
+
+
+def find_comment(post, comment_id):
+    """Комментарий к post по id из запроса; None, если id не указан."""
+    if not comment_id:
+        return None
+    if not comment_id.isdigit():
+        raise Http404
+    return get_object_or_404(Comment, pk=comment_id, post=post)
+
+
+@replica_reads
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    author = post.author
-    posts_count = author.posts.count()
-    number_of_following = author.follower.count()
-    number_of_follower = author.following.count()
-    comments = post.comments.all()
-    form = CommentForm()
-    return render(
-        request,
-        'post.html',
-        {
-            'author': author,
-            'post': post,
-            'posts_count': posts_count,
-            'number_of_follower': number_of_follower,
-            'number_of_following': number_of_following,
-            'comments': comments,
-            'form': form,
-        }
+    post = get_object_or_404(
+        Post.objects.for_cards().select_related('author__stats'),
+        author__username=username,
+        id=post_id
+    )
+    validators = PageValidators(request, *post_page_scopes(post))
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+
+    def render_page():
+        author = post.author
+        stats = get_stats(author)
+        comments = comment_page(post, {})
+        form = CommentForm()
+        return render(
+            request,
+            'post.html',
+            {
+                'author': author,
+                'post': post,
+                'posts_count': stats.posts_count,
+                'number_of_follower': stats.followers_count,
+                'number_of_following': stats.following_count,
+                'comments': comments.object_list,
+                'comments_page': comments,
+                'form': form,
+                'page_holes': True,
+            }
+        )
+
+    return validators.apply(
+        cached_page(request, validators.version, render_page)
+    )
+
+
+@replica_reads
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»:
+    HTML-фрагмент или, с ?format=json, JSON."""
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        author__username=username,
+        id=post_id
     )
+    validators = PageValidators(request, *post_page_scopes(post))
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    thread = find_comment(post, request.GET.get('thread'))
+    page = comment_page(post, {'after': request.GET.get('after')}, thread)
+    if request.GET.get('format') != 'json':
+        return validators.apply(render(
+            request,
+            'includes/comment_list.html',
+            {
+                'post': post,
+                'thread': thread,
+                'comments': page.object_list,
+                'comments_page': page,
+            }
+        ))
+    next_url = None
+    if page.has_next():
+        next_url = '{}?{}'.format(
+            reverse(
+                'post_comments',
+                kwargs={'username': username, 'post_id': post_id}
+            ),
+            urlencode({
+                **({'thread': thread.pk} if thread else {}),
+                'after': page.next_cursor,
+                'format': 'json',
+            })
+        )
+    return validators.apply(JsonResponse({
+        'comments': [
+            {
+                'id': comment.id,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+                'parent': comment.parent_id,
+                'depth': comment.depth,
+            }
+            for comment in page.object_list
+        ],
+        'next': next_url,
+    }))
 
 
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following_flag = None
-    if request.user.is_authenticated and request.user != author:
-        following_flag = author.following.filter(user=request.user).exists()
-    post_list = author.posts.all()
-    posts_count = author.posts.count()
-    number_of_following = author.follower.count()
-    number_of_follower = author.following.count()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    validators = PageValidators(
         request,
-        'profile.html',
-        {
-            'author': author,
-            'following_flag': following_flag,
-            'number_of_follower': number_of_follower,
-            'number_of_following': number_of_following,
-            'page': page,
-            'posts_count': posts_count,
-        }
+        cache_versions.profile_scope(author.pk)
+    )
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+
+    def render_page():
+        # Кнопку подписки рисует page_cache для каждого пользователя.
+        post_list = author.posts.for_cards()
+        stats = get_stats(author)
+        # Число записей автора известно из счётчика, поэтому у профиля
+        # навигация с номерами страниц, а не только курсорная.
+        page = CursorPaginator(
+            post_list,
+            count=stats.posts_count
+        ).get_page(request.GET)
+        return render(
+            request,
+            'profile.html',
+            {
+                'author': author,
+                'number_of_follower': stats.followers_count,
+                'number_of_following': stats.following_count,
+                'page': page,
+                'posts_count': stats.posts_count,
+                'cache_version': validators.version,
+                'page_holes': True,
+            }
+        )
+
+    return validators.apply(
+        cached_page(request, validators.version, render_page)
     )
 
 
@@ -117,7 +288,11 @@ def post_edit(request, username, post_id):
             'new.html',
             {'form': form, 'old_post': old_post, 'view_def': view_def}
         )
-    form.save()
+    edited_post = form.save()
+    if 'image' in form.changed_data:
+        drop_variants(edited_post)
+        if edited_post.image:
+            schedule_post_thumbnails(edited_post)
     return redirect(
         reverse(
             'post',
@@ -127,12 +302,24 @@ def post_edit(request, username, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_cards().select_related('author__stats'),
+        author__username=username,
+        id=post_id
+    )
     author = post.author
-    posts_count = author.posts.count()
-    comments = post.comments.all()
-    form = CommentForm(request.POST or None)
+    posts_count = get_stats(author).posts_count
+    comments = comment_page(post, {})
+    # Ограничения веток проверяет Comment.clean() при валидации формы.
+    form = CommentForm(
+        request.POST or None,
+        instance=Comment(
+            post=post,
+            parent=find_comment(post, request.POST.get('parent'))
+        )
+    )
     if not form.is_valid():
         return render(
             request,
@@ -141,13 +328,13 @@ def add_comment(request, username, post_id):
                 'author': author,
                 'post': post,
                 'posts_count': posts_count,
-                'comments': comments,
+                'comments': comments.object_list,
+                'comments_page': comments,
                 'form': form,
             }
         )
     new_comment = form.save(commit=False)
     new_comment.author = request.user
-    new_comment.post = post
     new_comment.save()
     return redirect(
         reverse(
@@ -157,20 +344,33 @@ def add_comment(request, username, post_id):
     )
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    # Лента меняется с любой записью (её версия — index) и с подписками
+    # читателя (версия его профиля).
+    validators = PageValidators(
         request,
-        'follow.html',
-        {'page_number': page_number, 'page': page, 'paginator': paginator}
+        cache_versions.index_scope(),
+        cache_versions.profile_scope(request.user.pk)
     )
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    page = feed_page(request.user, request.GET)
+    return validators.apply(render(
+        request,
+        'follow.html',
+        {
+            'page_number': page.number,
+            'page': page,
+            'paginator': page.paginator,
+        }
+    ))
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(
         User,
@@ -194,6 +394,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     delited_follow = get_object_or_404(
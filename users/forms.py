@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.contrib.sites.shortcuts import get_current_site
+
+from jobs.queue import enqueue
 
 User = get_user_model()
 
@@ -8,3 +11,35 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо отправляет воркер очереди. В задаче хранится только id
+    пользователя и адрес сайта: ссылка с токеном строится и письмо
+    рисуется уже в задаче, поэтому в таблице задач (в том числе
+    упавших) их нет. Токен всегда от default_token_generator."""
+
+    def save(self, domain_override=None,
+             subject_template_name='registration/password_reset_subject.txt',
+             email_template_name='registration/password_reset_email.html',
+             use_https=False, token_generator=None, from_email=None,
+             request=None, html_email_template_name=None,
+             extra_email_context=None):
+        if domain_override:
+            site_name = domain = domain_override
+        else:
+            current_site = get_current_site(request)
+            site_name, domain = current_site.name, current_site.domain
+        for user in self.get_users(self.cleaned_data['email']):
+            enqueue(
+                'users.send_password_reset',
+                user.pk,
+                domain=domain,
+                site_name=site_name,
+                protocol='https' if use_https else 'http',
+                subject_template_name=subject_template_name,
+                email_template_name=email_template_name,
+                from_email=from_email,
+                html_email_template_name=html_email_template_name,
+                extra_email_context=extra_email_context,
+            )
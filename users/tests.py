@@ -1,3 +1,42 @@
-# from django.test import TestCase
+import re
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from jobs.models import Job
+
+User = get_user_model()
+
+
+class PasswordResetMailTests(TestCase):
+    def test_reset_mail_sent_by_worker(self):
+        """Письмо сброса пароля отправляет воркер очереди, а не запрос;
+        в задаче нет ни текста письма, ни токена"""
+        user = User.objects.create_user(
+            username='Mr_Mail',
+            email='mail@example.com',
+            password='test_password'
+        )
+        response = Client().post(
+            reverse('password_reset'),
+            {'email': 'mail@example.com'}
+        )
+        self.assertRedirects(response, reverse('password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get(name='users.send_password_reset')
+        self.assertNotIn('/reset/', job.payload)
+        self.assertNotIn(urlsafe_base64_encode(force_bytes(user.pk)),
+                         job.payload)
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['mail@example.com'])
+        link = re.search(r'http://testserver(/\S+)', mail.outbox[0].body)[1]
+        response = Client().get(link, follow=True)
+        self.assertTrue(response.context['validlink'])
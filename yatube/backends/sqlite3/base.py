@@ -0,0 +1,18 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """sqlite3, в котором транзакции начинаются с BEGIN IMMEDIATE.
+
+    Обычный BEGIN откладывает блокировку записи до первого изменения.
+    Транзакция, которая сначала читает, а потом пишет (add_comment,
+    new_post), при встречной записи получает «database is locked» сразу,
+    минуя busy_timeout: в WAL её снимок уже устарел, а в режиме журнала
+    ожидание привело бы к взаимной блокировке. BEGIN IMMEDIATE берёт
+    блокировку записи в начале транзакции, и писатели ждут друг друга
+    в пределах busy_timeout. Читатели в WAL при этом не ждут никого.
+    """
+    begin_statement = 'BEGIN IMMEDIATE'
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(self.begin_statement)
@@ -0,0 +1,328 @@
+"""Общий для всех процессов кеш в файле SQLite.
+
+LocMemCache у каждого воркера свой, и инвалидация до соседних
+процессов не доходит. SQLiteCache хранит записи в одном файле
+(режим WAL), вытесняет давно не читавшиеся записи (LRU) при
+превышении MAX_ENTRIES или MAX_SIZE байт и ведёт статистику
+попаданий, промахов и вытеснений по префиксу ключа.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 2 ** 20},
+        }
+    }
+"""
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from yatube.metrics import CacheMetricsMixin, record_cache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE TABLE IF NOT EXISTS cache_total (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_total VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry
+BEGIN
+    UPDATE cache_total SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry
+BEGIN
+    UPDATE cache_total SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_resize
+AFTER UPDATE OF size ON cache_entry
+BEGIN
+    UPDATE cache_total SET size = size - OLD.size + NEW.size;
+END;
+CREATE TABLE IF NOT EXISTS cache_stats (
+    prefix TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+'''
+STAT_FIELDS = ('hits', 'misses', 'evictions')
+# Время последнего чтения обновляется не чаще раза в секунду:
+# для LRU этого достаточно, а чтение не превращается в запись.
+ACCESS_RESOLUTION = 1
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_INTERVAL = 5
+KEY_PREFIX_RE = re.compile(r'(.+?)(?::|\|\||\.)[^:|.]*$')
+
+
+def key_prefix(key):
+    """Ключ без последнего, изменчивого сегмента:
+    'version:group:5' -> 'version:group',
+    'template.cache.index_page.<md5>' -> 'template.cache.index_page'."""
+    match = KEY_PREFIX_RE.match(key)
+    return match.group(1) if match else key
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 0)) or None
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._pending_stats = defaultdict(lambda: [0, 0, 0])
+        self._pending_ops = 0
+        self._flushed_at = time.monotonic()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _record(self, key, field, amount=1):
+        with self._stats_lock:
+            self._pending_stats[key_prefix(key)][
+                STAT_FIELDS.index(field)
+            ] += amount
+            self._pending_ops += 1
+            due = (
+                self._pending_ops >= STATS_FLUSH_EVERY
+                or time.monotonic() - self._flushed_at > STATS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        with self._stats_lock:
+            pending = self._pending_stats
+            self._pending_stats = defaultdict(lambda: [0, 0, 0])
+            self._pending_ops = 0
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        self._connection.executemany(
+            'INSERT INTO cache_stats (prefix, hits, misses, evictions) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (prefix) DO UPDATE SET '
+            'hits = hits + excluded.hits, '
+            'misses = misses + excluded.misses, '
+            'evictions = evictions + excluded.evictions',
+            [(prefix, *counts) for prefix, counts in pending.items()]
+        )
+
+    def get_stats(self):
+        """{префикс: {'hits': .., 'misses': .., 'evictions': ..}}"""
+        self.flush_stats()
+        rows = self._connection.execute(
+            'SELECT prefix, hits, misses, evictions FROM cache_stats '
+            'ORDER BY prefix'
+        )
+        return {
+            prefix: dict(zip(STAT_FIELDS, counts))
+            for prefix, *counts in rows
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._pending_stats.clear()
+            self._pending_ops = 0
+        self._connection.execute('DELETE FROM cache_stats')
+
+    def get_totals(self):
+        entries, size = self._connection.execute(
+            'SELECT entries, size FROM cache_total'
+        ).fetchone()
+        return {'entries': entries, 'size': size}
+
+    def _fetch(self, key, now):
+        row = self._connection.execute(
+            'SELECT value, expires, accessed FROM cache_entry WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._connection.execute(
+                'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                (key, now)
+            )
+            return None
+        if now - accessed > ACCESS_RESOLUTION:
+            self._connection.execute(
+                'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+                (now, key)
+            )
+        return value
+
+    def get(self, key, default=None, version=None):
+        raw_key = key
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._fetch(key, time.time())
+        if value is None:
+            self._record(raw_key, 'misses')
+            record_cache(misses=1)
+            return default
+        self._record(raw_key, 'hits')
+        record_cache(hits=1)
+        return pickle.loads(value)
+
+    def _store(self, key, value, timeout, now):
+        data = pickle.dumps(value, self.pickle_protocol)
+        self._connection.execute(
+            'INSERT INTO cache_entry (key, value, expires, accessed, size) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed, size = excluded.size',
+            (key, data, self.get_backend_timeout(timeout), now, len(data))
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(key, value, timeout, time.time())
+        self._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self._fetch(key, now) is not None:
+                added = False
+            else:
+                self._store(key, value, timeout, now)
+                added = True
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if added:
+            self._cull()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            value = self._fetch(key, now)
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(value) + delta
+            connection.execute(
+                'UPDATE cache_entry SET value = ?, accessed = ? '
+                'WHERE key = ?',
+                (pickle.dumps(new_value, self.pickle_protocol), now, key)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection.execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return bool(cursor.rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection.execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection.execute(
+            'DELETE FROM cache_entry WHERE key = ?', (key,)
+        )
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache_entry')
+
+    def _over_limit(self):
+        totals = self.get_totals()
+        return (
+            (self._max_entries and totals['entries'] > self._max_entries)
+            or (self._max_size and totals['size'] > self._max_size)
+        )
+
+    def _cull(self):
+        if not self._over_limit():
+            return
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?', (time.time(),)
+        )
+        while self._over_limit():
+            entries = self.get_totals()['entries']
+            batch = max(entries // self._cull_frequency, 1)
+            keys = [
+                key for key, in connection.execute(
+                    'SELECT key FROM cache_entry ORDER BY accessed LIMIT ?',
+                    (batch,)
+                )
+            ]
+            if not keys:
+                return
+            connection.executemany(
+                'DELETE FROM cache_entry WHERE key = ?',
+                [(key,) for key in keys]
+            )
+            for key in keys:
+                self._record(self._user_key(key), 'evictions')
+
+    def _user_key(self, key):
+        """Снимает KEY_PREFIX и версию, добавленные make_key()."""
+        return key.split(':', 2)[-1]
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    """LocMemCache, попадания которого видит MetricsMiddleware."""
@@ -0,0 +1,30 @@
+"""Настройка соединений SQLite по профилю базы из settings.
+
+Pragma вроде synchronous, busy_timeout, mmap_size и cache_size
+действуют только на соединение, поэтому выполняются для каждого
+нового соединения по сигналу connection_created. journal_mode=WAL
+записывается в файл базы и сохраняется, но повторная установка почти
+ничего не стоит. С CONN_MAX_AGE из того же профиля соединение
+переживает запрос, и pragma выполняются один раз на соединение,
+а не на каждый запрос.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет pragmas на соединении sqlite3 (DB-API, не Django)."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}').fetchall()
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    # Сырое соединение, а не connection.cursor(): pragma не должны
+    # попадать в замеры и подсчёт запросов.
+    if connection.vendor == 'sqlite':
+        apply_pragmas(
+            connection.connection,
+            getattr(settings, 'SQLITE_PRAGMAS', {})
+        )
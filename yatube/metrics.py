@@ -0,0 +1,205 @@
+"""Замеры запросов: SQL, шаблоны, кеш и общее время по каждой view.
+
+MetricsMiddleware на время запроса подключает execute_wrapper ко всем
+соединениям с базой, шаблоны считаются бэкендом DjangoTemplates из
+этого модуля, а обращения к кешу — бэкендами yatube.cache. Итог
+запроса уходит в заголовок Server-Timing и в скользящее окно из
+METRICS_WINDOW последних запросов каждой view, по которому
+metrics_view (только для staff) считает p50/p95/p99.
+
+Окно хранится в памяти процесса: у каждого воркера сервера своя
+статистика, в ответе указан pid.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+PERCENTILES = (50, 95, 99)
+FIELDS = ('total_ms', 'db_ms', 'render_ms', 'queries', 'cache_hits',
+          'cache_misses')
+
+_local = threading.local()
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'render_time', 'render_depth',
+                 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        # Число шаблонов, которые рисуются сейчас: render_to_string()
+        # внутри отрисовки другого шаблона не считается отдельно.
+        self.render_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current():
+    """Замеры текущего запроса или None вне MetricsMiddleware."""
+    return getattr(_local, 'metrics', None)
+
+
+def record_cache(hits=0, misses=0):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи get() для бэкендов кеша, которые
+    сами этого не делают."""
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            record_cache(misses=1)
+            return default
+        record_cache(hits=1)
+        return value
+
+
+def _count_query(execute, sql, params, many, context):
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+class TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        metrics.render_depth += 1
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.render_depth -= 1
+            if not metrics.render_depth:
+                metrics.render_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Стандартный бэкенд, который учитывает время отрисовки шаблонов.
+
+    Вложенные {% include %} идут мимо бэкенда, а render_to_string(),
+    вызванный во время отрисовки другого шаблона (карточки записей,
+    «дырки» page_cache), идёт через него, но его время уже входит
+    во внешний шаблон и второй раз не прибавляется.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name),
+                self
+            )
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def _window(view_name):
+    window = _windows.get(view_name)
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault(
+                view_name,
+                deque(maxlen=getattr(settings, 'METRICS_WINDOW', 1000))
+            )
+    return window
+
+
+def server_timing(metrics, total):
+    return (
+        f'db;dur={metrics.db_time * 1000:.1f};'
+        f'desc="{metrics.queries} queries", '
+        f'tpl;dur={metrics.render_time * 1000:.1f}, '
+        f'cache;desc="{metrics.cache_hits} hits '
+        f'{metrics.cache_misses} misses", '
+        f'total;dur={total * 1000:.1f}'
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        _window(match.view_name if match else 'unresolved').append((
+            total * 1000,
+            metrics.db_time * 1000,
+            metrics.render_time * 1000,
+            metrics.queries,
+            metrics.cache_hits,
+            metrics.cache_misses,
+        ))
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(metrics, total)
+        return response
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    return {
+        f'p{rank}': round(
+            ordered[max(0, -(-len(ordered) * rank // 100) - 1)], 2
+        )
+        for rank in PERCENTILES
+    }
+
+
+def snapshot():
+    """{view: {'count': n, поле: {'p50': .., 'p95': .., 'p99': ..}}}"""
+    result = {}
+    for view_name, window in sorted(_windows.items()):
+        samples = list(window)
+        if not samples:
+            continue
+        stats = {'count': len(samples)}
+        for field, values in zip(FIELDS, zip(*samples)):
+            stats[field] = percentiles(values)
+        result[view_name] = stats
+    return result
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse({'pid': os.getpid(), 'views': snapshot()})
@@ -0,0 +1,133 @@
+"""Чтение с реплик базы.
+
+Запросы на чтение из view, помеченных @replica_reads (страницы,
+которые только показывают данные), ReplicaRouter отправляет на одну
+из реплик settings.DATABASE_REPLICAS; всё остальное, в том числе
+любая запись, идёт на основную базу default.
+
+Реплика отстаёт от основной базы не больше чем на
+DATABASE_REPLICA_LAG секунд. Чтобы пользователь сразу видел свою
+запись или комментарий, ReplicaMiddleware после запроса, который писал
+в базу, ставит cookie на тот же срок: пока она жива, чтения этого
+клиента идут на основную базу. Служебные записи cookie не ставят:
+сессии и задачи (PRIMARY_APPS) и всё, что пишут view с @replica_reads
+(например, недостающие счётчики UserStats), — иначе обычный просмотр
+страниц уводил бы клиентов с реплик.
+
+Локально реплики — копии файла SQLite, которые обновляет
+sync_replicas() (команда sync_replicas).
+"""
+import random
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'yatube_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+# Сессии и очередь задач читаются только с основной базы: вход
+# и задача, поставленная только что, должны быть видны сразу.
+PRIMARY_APPS = ('sessions', 'jobs')
+
+_local = threading.local()
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def replica_lag():
+    return getattr(settings, 'DATABASE_REPLICA_LAG', 10)
+
+
+def replica_reads(view):
+    """Помечает view, которая только читает данные."""
+    view.replica_reads = True
+    return view
+
+
+def read_alias():
+    """Реплика для чтений текущего запроса или None."""
+    return getattr(_local, 'read_alias', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        if not (
+            model._meta.app_label in PRIMARY_APPS
+            or getattr(_local, 'read_only_view', False)
+        ):
+            _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплики получают вместе с данными основной базы.
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self._reset()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _local.wrote
+            self._reset()
+        if replica_aliases() and (
+            wrote or request.method not in SAFE_METHODS
+        ):
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=replica_lag(),
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    @staticmethod
+    def _reset():
+        _local.read_alias, _local.wrote = None, False
+        _local.read_only_view = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.read_only_view = getattr(view_func, 'replica_reads', False)
+        aliases = replica_aliases()
+        if (
+            aliases
+            and getattr(view_func, 'replica_reads', False)
+            and request.method in SAFE_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+        ):
+            _local.read_alias = random.choice(aliases)
+
+
+def sync_replicas(aliases=None):
+    """Копирует основную базу SQLite в файлы реплик одним снимком
+    (backup API), как асинхронная репликация с задержкой."""
+    source = connections[PRIMARY]
+    source.ensure_connection()
+    for alias in aliases or replica_aliases():
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
@@ -27,6 +27,8 @@ INSTALLED_APPS = [
     'users',
     'posts',
     'about',
+    'jobs',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -37,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,12 +53,30 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Профиль шаблонов: с YATUBE_TEMPLATE_CACHE=1 (по умолчанию при
+# DEBUG = False) шаблоны компилируются один раз на процесс, прямо при
+# запуске (yatube.template_cache), а правки файлов видны только после
+# перезапуска. YATUBE_TEMPLATE_WARMUP=1 вдобавок отрисовывает каждый
+# шаблон при запуске.
+TEMPLATE_CACHE = os.environ.get(
+    'YATUBE_TEMPLATE_CACHE',
+    '0' if DEBUG else '1'
+) == '1'
+TEMPLATE_WARMUP = os.environ.get('YATUBE_TEMPLATE_WARMUP') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -71,13 +93,67 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
+# Профиль базы выбирается переменной окружения YATUBE_DB_PROFILE
+# (по умолчанию production при DEBUG = False):
+# default — соединение на каждый запрос и настройки SQLite по умолчанию;
+# production — соединения живут CONN_MAX_AGE секунд, а каждое новое
+# получает PRAGMAS (yatube.db): WAL, чтобы чтения не ждали записей,
+# synchronous=NORMAL (в WAL это безопасно для целостности), ожидание
+# блокировки вместо ошибки «database is locked», отображение файла
+# в память и кеш страниц побольше; транзакции берут блокировку записи
+# сразу (yatube.backends.sqlite3), иначе busy_timeout не помогает.
+DATABASE_PROFILES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {},
+    },
+    'production': {
+        'ENGINE': 'yatube.backends.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 10000,
+            'mmap_size': 256 * 2 ** 20,
+            'cache_size': -64 * 2 ** 10,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+DATABASE_PROFILE = DATABASE_PROFILES[os.environ.get(
+    'YATUBE_DB_PROFILE',
+    'default' if DEBUG else 'production'
+)]
+SQLITE_PRAGMAS = DATABASE_PROFILE['PRAGMAS']
+
+DATABASES = {
+    'default': {
+        'ENGINE': DATABASE_PROFILE['ENGINE'],
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': DATABASE_PROFILE['CONN_MAX_AGE'],
     }
 }
 
+# Реплики для чтения (yatube.replicas): YATUBE_DB_REPLICAS=N добавляет
+# N копий базы в файлах db.replicaK.sqlite3, их обновляет
+# python manage.py sync_replicas. Страницы, которые только читают,
+# читают с реплик; после записи клиент DATABASE_REPLICA_LAG секунд
+# читает с основной базы, а версии кеша страниц увеличиваются ещё раз,
+# когда реплики догонят основную базу.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1)
+]
+DATABASE_REPLICA_LAG = 10
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -121,6 +197,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузка изображений записей (posts.uploads): файл больше
+# POST_IMAGE_MAX_BYTES обрывается при чтении запроса, картинка больше
+# POST_IMAGE_MAX_PIXELS отклоняется по заголовку, а сторона больше
+# POST_IMAGE_MAX_SIDE уменьшается при приёме.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
@@ -129,8 +218,55 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кеш выбирается переменной окружения YATUBE_CACHE:
+# locmem — отдельный кеш в памяти каждого процесса (по умолчанию при
+# DEBUG = True), sqlite — общий файл для всех воркеров сервера
+# с LRU-вытеснением (по умолчанию при DEBUG = False). Версии кеша
+# увеличиваются только в кеше процесса, который обработал запись,
+# поэтому с locmem страницы и карточки хранятся не дольше
+# LOCAL_PAGE_CACHE_TIMEOUT секунд.
+CACHE_PROFILES = {
+    'locmem': {
+        'BACKEND': 'yatube.cache.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH',
+            os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
+    },
+}
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_PROFILES[os.environ.get(
+        'YATUBE_CACHE',
+        'locmem' if DEBUG else 'sqlite'
+    )],
 }
+LOCAL_PAGE_CACHE_TIMEOUT = 20
+
+# Замеры запросов (yatube.metrics): заголовок Server-Timing и окно из
+# METRICS_WINDOW последних запросов каждой view для /metrics/.
+METRICS_SERVER_TIMING = True
+METRICS_WINDOW = 1000
+
+# Лента подписок: авторы, у которых подписчиков больше этого числа,
+# не рассылаются по лентам, а подмешиваются при чтении (гибридный режим).
+# None — рассылать записи всех авторов.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+
+# Фоновые задачи (приложение jobs, воркер: python manage.py run_jobs).
+# JOBS_EAGER = True выполняет задачи сразу после коммита, без воркера.
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 30
+JOBS_LOCK_TIMEOUT = 600
+
+# Кеш страниц целиком (posts.page_cache): ключ включает версию области
+# кеша, так что изменения видны сразу, а срок лишь ограничивает объём.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 12
@@ -0,0 +1,128 @@
+"""Компиляция шаблонов проекта при запуске.
+
+С загрузчиком django.template.loaders.cached (профиль шаблонов
+с кешем в settings) каждый шаблон читается с диска и разбирается
+один раз на процесс, но это происходит на первом запросе, который
+его использует. precompile() делает это сразу при запуске для всех
+шаблонов из каталогов проекта (templates/ и templates/ приложений),
+warm_up() вдобавок отрисовывает каждый шаблон один раз, чтобы заранее
+построить то, что шаблоны создают лениво: таблицу обратного
+разрешения URL, хранилище статики, форматы дат.
+
+Обе функции вызывает yatube/wsgi.py. Если воркеры сервера
+порождаются после загрузки приложения (gunicorn --preload),
+скомпилированные шаблоны достаются им общей памятью.
+
+build_engine() и render_cost() нужны команде template_benchmark,
+которая сравнивает стоимость отрисовки с кешем шаблонов и без него.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from django.template import Context, Engine, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+def _cached_loaders(engine):
+    return [
+        loader for loader in engine.template_loaders
+        if isinstance(loader, CachedLoader)
+    ]
+
+
+def project_template_names(engine):
+    """Имена всех шаблонов из каталогов проекта, без шаблонов
+    установленных пакетов (например, админки)."""
+    names = set()
+    for loader in _cached_loaders(engine) or engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in inner.get_dirs():
+                directory = str(directory)
+                if not directory.startswith(settings.BASE_DIR):
+                    continue
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        if name.endswith('.html'):
+                            names.add(os.path.relpath(
+                                os.path.join(root, name),
+                                directory
+                            ).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def _django_backends():
+    return [
+        backend for backend in engines.all() if hasattr(backend, 'engine')
+    ]
+
+
+def precompile():
+    """Компилирует шаблоны проекта в кеш загрузчика; без загрузчика
+    cached ничего не делает. Возвращает список имён."""
+    compiled = []
+    for backend in _django_backends():
+        if not _cached_loaders(backend.engine):
+            continue
+        for name in project_template_names(backend.engine):
+            backend.engine.get_template(name)
+            compiled.append(name)
+    return compiled
+
+
+def warm_up():
+    """Отрисовывает каждый шаблон проекта с пустым контекстом.
+
+    Шаблонам нужны данные, которых здесь нет, поэтому ошибки
+    отрисовки ожидаемы и пропускаются: разогрев нужен ради побочных
+    эффектов. Возвращает число шаблонов, отрисованных без ошибок.
+    """
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = '/'
+    request.user = AnonymousUser()
+    rendered = 0
+    for backend in _django_backends():
+        for name in project_template_names(backend.engine):
+            try:
+                backend.get_template(name).render({}, request)
+            except Exception:
+                continue
+            rendered += 1
+    return rendered
+
+
+def build_engine(cached):
+    """Копия движка из settings.TEMPLATES с кешем шаблонов или без,
+    для сравнения стоимости отрисовки."""
+    engine = _django_backends()[0].engine
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(
+        dirs=engine.dirs,
+        debug=engine.debug,
+        loaders=loaders,
+        string_if_invalid=engine.string_if_invalid,
+        file_charset=engine.file_charset,
+        libraries=engine.libraries,
+        builtins=engine.builtins,
+        autoescape=engine.autoescape,
+    )
+
+
+def render_cost(engine, name, context, renders):
+    """(первая отрисовка, средняя из renders следующих) в секундах;
+    шаблон каждый раз запрашивается у движка, как при обычном render()."""
+    def render_once():
+        start = time.perf_counter()
+        engine.get_template(name).render(Context(context))
+        return time.perf_counter() - start
+
+    first = render_once()
+    return first, sum(render_once() for _ in range(renders)) / renders
@@ -0,0 +1,341 @@
+import itertools
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from os import path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from jobs.models import Job
+from jobs.queue import run_job
+from posts.models import Post, User, UserStats
+from yatube import metrics, replicas, template_cache
+from yatube.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """set/get/add/incr/delete работают как у встроенных бэкендов"""
+        self.cache.set('version:index', 1)
+        self.assertEqual(self.cache.get('version:index'), 1)
+        self.assertFalse(self.cache.add('version:index', 5))
+        self.assertTrue(self.cache.add('version:group', 5))
+        self.assertEqual(self.cache.incr('version:index'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('version:missing')
+        self.cache.delete('version:index')
+        self.assertIsNone(self.cache.get('version:index'))
+        self.cache.set('expired', 'value', 0)
+        self.assertFalse(self.cache.has_key('expired'))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому"""
+        self.cache.set('version:index', 10, None)
+        other = self.make_cache()
+        self.assertEqual(other.incr('version:index'), 11)
+        self.assertEqual(self.cache.get('version:index'), 11)
+
+    @mock.patch('yatube.cache.ACCESS_RESOLUTION', 0)
+    def test_lru_eviction_by_entries_and_size(self):
+        """При переполнении вытесняются давно не читавшиеся записи"""
+        cache = self.make_cache(MAX_ENTRIES=3)
+        for key in ('page:a', 'page:b', 'page:c'):
+            cache.set(key, key)
+        cache.get('page:a')
+        cache.set('page:d', 'page:d')
+        self.assertIsNone(cache.get('page:b'))
+        self.assertEqual(cache.get('page:a'), 'page:a')
+
+        cache = self.make_cache(MAX_ENTRIES=1000, MAX_SIZE=2000)
+        cache.clear()
+        for number in range(10):
+            cache.set(f'blob:{number}', b'x' * 500)
+        self.assertLessEqual(cache.get_totals()['size'], 2000)
+        self.assertEqual(cache.get('blob:9'), b'x' * 500)
+
+    def test_stats_by_prefix(self):
+        """Статистика попаданий и промахов ведётся по префиксу ключа"""
+        self.cache.set('template.cache.index_page.abc', 'html')
+        self.cache.get('template.cache.index_page.abc')
+        self.cache.get('template.cache.index_page.def')
+        self.cache.get('version:index')
+        stats = self.cache.get_stats()
+        self.assertEqual(
+            stats['template.cache.index_page'],
+            {'hits': 1, 'misses': 1, 'evictions': 0}
+        )
+        self.assertEqual(stats['version']['misses'], 1)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._windows.clear()
+        author = User.objects.create_user(username='Mr_Metrics')
+        Post.objects.create(text='Запись для замеров', author=author)
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с запросами, шаблонами и кешем"""
+        self.client.get(reverse('index'))
+        header = self.client.get(reverse('index'))['Server-Timing']
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(header, r'tpl;dur=[\d.]+')
+        self.assertRegex(header, r'total;dur=[\d.]+')
+        hits = int(re.search(r'cache;desc="(\d+) hits', header).group(1))
+        self.assertGreater(hits, 0)
+
+    def test_nested_renders_counted_once(self):
+        """Карточки, нарисованные render_to_string() во время отрисовки
+        списка, не прибавляют своё время к времени шаблонов второй раз"""
+        author = User.objects.get(username='Mr_Metrics')
+        for number in range(10):
+            Post.objects.create(text=f'Карточка {number}', author=author)
+        posts = list(Post.objects.for_cards())
+        template = engines.all()[0].from_string(
+            '{% load page_holes %}{% post_cards posts %}'
+        )
+        request_metrics = metrics.RequestMetrics()
+        metrics._local.metrics = request_metrics
+        self.addCleanup(delattr, metrics._local, 'metrics')
+        # Часы идут на единицу при каждом обращении: время отрисовки —
+        # число обращений к ним за время внешнего шаблона.
+        clock = itertools.count()
+        with mock.patch('time.perf_counter', lambda: next(clock)):
+            start = time.perf_counter()
+            template.render({'posts': posts, 'page_holes': True})
+            total = time.perf_counter() - start
+        self.assertLessEqual(request_metrics.render_time, total)
+        self.assertEqual(request_metrics.render_depth, 0)
+
+    def test_percentiles_for_staff_only(self):
+        """Перцентили по view доступны только сотрудникам"""
+        for _ in range(3):
+            self.client.get(reverse('index'))
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        views = self.client.get(url).json()['views']
+        self.assertEqual(views['index']['count'], 3)
+        self.assertEqual(
+            set(views['index']['total_ms']),
+            {'p50', 'p95', 'p99'}
+        )
+
+    def test_percentiles(self):
+        """Перцентили считаются по ближайшему рангу"""
+        self.assertEqual(
+            metrics.percentiles(range(1, 101)),
+            {'p50': 50, 'p95': 95, 'p99': 99}
+        )
+
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def templates_with(loaders):
+    return [{
+        **settings.TEMPLATES[0],
+        'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'], 'loaders': loaders},
+    }]
+
+
+class TemplateCacheTests(SimpleTestCase):
+    @override_settings(TEMPLATES=templates_with([
+        ('django.template.loaders.cached.Loader', PLAIN_LOADERS),
+    ]))
+    def test_precompile_fills_loader_cache(self):
+        """При запуске компилируются все шаблоны проекта, и только они"""
+        names = template_cache.precompile()
+        for name in ('includes/post_item.html', 'paginator.html',
+                     'new.html', 'signup.html', 'about/tech.html'):
+            self.assertIn(name, names)
+        self.assertNotIn('admin/base.html', names)
+        loader, = [
+            loader for loader in engines.all()[0].engine.template_loaders
+            if isinstance(loader, CachedLoader)
+        ]
+        self.assertEqual(set(loader.get_template_cache), set(names))
+        self.assertGreater(template_cache.warm_up(), 0)
+
+    @override_settings(TEMPLATES=templates_with(PLAIN_LOADERS))
+    def test_precompile_needs_cached_loader(self):
+        """Без загрузчика cached компилировать заранее бессмысленно"""
+        self.assertEqual(template_cache.precompile(), [])
+
+
+PRODUCTION_DB = settings.DATABASE_PROFILES['production']
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_connection(self):
+        wrapper = import_string(
+            f"{PRODUCTION_DB['ENGINE']}.base.DatabaseWrapper"
+        )
+        return wrapper({
+            **settings.DATABASES['default'],
+            'NAME': self.location,
+            'CONN_MAX_AGE': PRODUCTION_DB['CONN_MAX_AGE'],
+        }, alias='profile_test')
+
+    @override_settings(SQLITE_PRAGMAS=PRODUCTION_DB['PRAGMAS'])
+    def test_new_connection_gets_pragmas(self):
+        """Каждое новое соединение получает pragma профиля"""
+        connection = self.make_connection()
+        try:
+            with connection.cursor() as cursor:
+                values = {}
+                for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+        finally:
+            connection.close()
+        self.assertEqual(
+            values,
+            {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 10000}
+        )
+
+    @override_settings(SQLITE_PRAGMAS=PRODUCTION_DB['PRAGMAS'])
+    def test_transaction_takes_write_lock_at_start(self):
+        """Транзакция сразу берёт блокировку записи, а читатели в WAL
+        её не ждут"""
+        connection = self.make_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        other = sqlite3.connect(self.location, timeout=0)
+        try:
+            # Так начинает транзакцию transaction.atomic().
+            connection.set_autocommit(
+                False,
+                force_begin_transaction_with_broken_autocommit=True
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM item')
+            self.assertEqual(
+                other.execute('SELECT count(*) FROM item').fetchone(),
+                (0,)
+            )
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                other.execute('INSERT INTO item VALUES (1)')
+            connection.rollback()
+        finally:
+            other.close()
+            connection.close()
+
+
+@override_settings(DATABASE_REPLICAS=['test_replica'], DATABASE_REPLICA_LAG=10)
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        connections.databases['test_replica'] = {
+            **settings.DATABASES['default'],
+            'NAME': path.join(self.directory, 'db.test_replica.sqlite3'),
+        }
+        connections.ensure_defaults('test_replica')
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.writer = Client()
+        self.writer.force_login(self.user)
+        replicas.sync_replicas()
+
+    def tearDown(self):
+        connections['test_replica'].close()
+        del connections['test_replica']
+        del connections.databases['test_replica']
+        shutil.rmtree(self.directory, ignore_errors=True)
+        cache.clear()
+
+    def publish(self, text):
+        return self.writer.post(reverse('new_post'), {'text': text})
+
+    def test_read_only_pages_read_from_replica(self):
+        """Анонимная главная читает с реплики, запись идёт в основную
+        базу и на реплике не видна до копирования"""
+        self.publish('Свежая запись')
+        self.assertTrue(Post.objects.filter(text='Свежая запись').exists())
+        with CaptureQueriesContext(connections['test_replica']) as queries:
+            response = Client().get(reverse('index'))
+        self.assertTrue(queries.captured_queries)
+        self.assertNotContains(response, 'Свежая запись')
+
+    def test_writer_reads_own_write_from_primary(self):
+        """После записи клиент получает cookie и читает с основной базы,
+        не получая копию страницы, нарисованную по реплике"""
+        Client().get(reverse('index'))
+        response = self.publish('Свежая запись')
+        cookie = response.cookies[replicas.STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        with CaptureQueriesContext(connections['test_replica']) as queries:
+            response = self.writer.get(reverse('index'))
+        self.assertEqual(queries.captured_queries, [])
+        self.assertContains(response, 'Свежая запись')
+
+    def test_service_writes_keep_reads_on_replica(self):
+        """Служебная запись на странице только для чтения (недостающие
+        счётчики) не ставит cookie, а подписка по ссылке ставит"""
+        author = User.objects.create_user(username='author')
+        UserStats.objects.filter(user=author).delete()
+        replicas.sync_replicas()
+        response = self.writer.get(
+            reverse('profile', args=[author.username])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserStats.objects.filter(user=author).exists())
+        self.assertNotIn(replicas.STICKY_COOKIE, response.cookies)
+        response = self.writer.get(
+            reverse('profile_follow', args=[author.username])
+        )
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+
+    def test_pages_refresh_after_replica_catches_up(self):
+        """Страница, закешированная по отстающей реплике, обновляется
+        отложенным увеличением версий кеша"""
+        self.publish('Свежая запись')
+        self.assertNotContains(Client().get(reverse('index')), 'Свежая запись')
+        replicas.sync_replicas()
+        self.assertNotContains(Client().get(reverse('index')), 'Свежая запись')
+        job = Job.objects.get(name='posts.bump_cache_versions')
+        run_job(job)
+        self.assertContains(Client().get(reverse('index')), 'Свежая запись')
+
+    def test_replicas_are_not_migrated(self):
+        """Схема реплики приходит с копией основной базы"""
+        router = replicas.ReplicaRouter()
+        self.assertFalse(router.allow_migrate('test_replica', 'posts'))
+        self.assertIsNone(router.allow_migrate('default', 'posts'))
@@ -1,7 +1,15 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны компилируются до первого запроса, а не во время него.
+from yatube import template_cache  # noqa: E402 (нужен django.setup())
+
+template_cache.precompile()
+if settings.TEMPLATE_WARMUP:
+    template_cache.warm_up()